@@ -19,20 +19,61 @@ def main():
     db.create_if_not_exists()
     coll.create_if_not_exists()
 
+    # Process-local memo in front of the Arango cache; Arango stays the
+    # cross-process tier while this absorbs repeated lookups within one run.
+    _mem = {}
+    # Values computed locally but not yet stored in Arango.
+    _pending_writes = {}
+
+    def warm_cache(n):
+        """Fetches every value at or below n already in the Arango cache
+        using a single round trip, rather than one GET per level of the
+        recursion."""
+        cached = coll.read_docs([str(k) for k in range(1, n + 1)])
+        for k in range(1, n + 1):
+            body = cached[str(k)]
+            if body is not None:
+                _mem[k] = body['value']
+
+    def flush_writes():
+        """Stores every locally computed value in the Arango cache using a
+        single round trip, rather than one POST per computed value."""
+        if _pending_writes:
+            coll.create_or_overwrite_docs(_pending_writes)
+            _pending_writes.clear()
+
     def triangle(n):
-        if n == 0:
-            return 1
+        if n in _mem:
+            return _mem[n]
 
-        doc = coll.document(str(n))
-        if not doc.read():
-            doc.body['value'] = n + triangle(n - 1)
-            assert doc.create() is True
-        return doc.body['value']
+        # Iterate up from the highest already-known value rather than
+        # recursing down; this avoids CPython's recursion limit (and a frame
+        # allocation per level) for large n.
+        start = n
+        while start > 1 and (start - 1) not in _mem:
+            start -= 1
+        val = 1 if start == 1 else _mem[start - 1]
+        for k in range(start, n + 1):
+            val = k + val
+            _mem[k] = val
+            _pending_writes[str(k)] = {'value': val}
+        return val
 
     print('Calculating triangle(19):')
+    warm_cache(19)
     print(triangle(19))
+    flush_writes()
 
     print('Calculating triangle(20):')
+    warm_cache(20)
+    print(triangle(20))
+    flush_writes()
+
+    print('Calculating triangle(20) again; served from the local memo:')
     print(triangle(20))
 
-    assert coll.force_delete() is True
+    # not an assert: under python -O the delete itself would be skipped
+    if coll.force_delete() is not True:
+        raise RuntimeError(  # pragma: no cover
+            'expected collection to exist and be deleted'
+        )
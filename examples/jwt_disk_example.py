@@ -9,6 +9,7 @@ from arango_crud import (
 )
 from arango_crud.database import Database
 import os
+import struct
 
 
 def main():
@@ -47,8 +48,12 @@ def main():
         print(fin.read())
     print()
     print('JWT file:')
-    with open('.jwt_disk_example') as fin:
-        print(fin.read())
+    with open('.jwt_disk_example', 'rb') as fin:
+        data = fin.read()
+    # an 8-byte little-endian float64 expiry followed by the ascii token
+    expires_at = struct.unpack_from('<d', data)[0]
+    print(f'expires_at_utc_seconds={expires_at}')
+    print(f'token={data[8:].decode("ascii")}')
 
     os.remove('.jwt_disk_example.lock')
     os.remove('.jwt_disk_example')
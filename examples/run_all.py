@@ -1,28 +1,25 @@
-"""Runs the main() function of all other py files in this directory"""
-import os
-import importlib
-import sys
-
-
-def main():
-    try:
-        import arango_crud  # noqa: F401
-    except ModuleNotFoundError:
-        sys.path.append('src')
-        import arango_crud  # noqa: F401
-
-    dir_path = os.path.dirname(os.path.realpath(__file__))
-    for curdir, _, files in os.walk(dir_path):
-        for f in files:
-            if f.endswith('.py'):
-                fullpath = os.path.join(curdir, f)
-                mod_nm = '.'.join(fullpath[len(dir_path) + len(os.path.sep):-3].split(os.path.sep))
-                if mod_nm == 'run_all':
-                    continue
-                print(f'Running {mod_nm}')
-                mod = importlib.import_module(mod_nm)
-                mod.main()
-
-
-if __name__ == '__main__':
-    main()
+"""Runs the main() function of all other py files in this directory"""
+from pathlib import Path
+import importlib
+import sys
+
+
+def main():
+    try:
+        import arango_crud  # noqa: F401
+    except ModuleNotFoundError:
+        sys.path.append('src')
+        import arango_crud  # noqa: F401
+
+    root = Path(__file__).resolve().parent
+    for path in root.rglob('*.py'):
+        mod_nm = '.'.join(path.relative_to(root).with_suffix('').parts)
+        if mod_nm == 'run_all':
+            continue
+        print(f'Running {mod_nm}')
+        mod = importlib.import_module(mod_nm)
+        mod.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,44 @@
-from .clusters import WeightedRandomCluster, RandomCluster  # noqa: F401
-from .back_off_strategies import StepBackOffStrategy  # noqa: F401
-from .auths import BasicAuth, JWTAuth, JWTDiskCache  # noqa: F401
-from .config import Config  # noqa: F401
-from .env_config import env_config  # noqa: F401
-
-import os
-import logging
-
-if os.environ.get('ARANGO_APPLY_BASIC_CONFIG') == 'true':
-    logging.basicConfig(
-        level=logging.INFO,
-        format="[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s"
-    )
+import importlib
+import os
+import logging
+
+_LAZY_IMPORTS = {
+    'WeightedRandomCluster': '.clusters',
+    'RandomCluster': '.clusters',
+    'StepBackOffStrategy': '.back_off_strategies',
+    'BasicAuth': '.auths',
+    'JWTAuth': '.auths',
+    'JWTDiskCache': '.auths',
+    'Config': '.config',
+    'env_config': '.env_config',
+    'AsyncCollection': '.async_api',
+    'AsyncDocument': '.async_api',
+    'DEFAULT_TTL': '.collection'
+}
+
+__all__ = tuple(_LAZY_IMPORTS)
+"""Star-import resolves these through the module __getattr__ below, so the
+submodules still load lazily."""
+
+
+def __getattr__(name):
+    """Imports the submodule providing name on first access (PEP 562) so
+    importing arango_crud doesn't pay for the parts of the module graph that
+    aren't used."""
+    source = _LAZY_IMPORTS.get(name)
+    if source is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    val = getattr(importlib.import_module(source, __name__), name)
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
+
+
+if os.environ.get('ARANGO_APPLY_BASIC_CONFIG') == 'true':
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s"
+    )
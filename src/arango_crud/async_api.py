@@ -0,0 +1,478 @@
+"""An asynchronous mirror of the document convenience functions on
+Collection, backed by httpx.AsyncClient. The workload is network-bound, so
+issuing many document operations concurrently (e.g. via asyncio.gather)
+completes in roughly the latency of the slowest one rather than the sum.
+Requires the optional httpx dependency; with Config(http2=True) concurrent
+requests additionally multiplex over a single connection.
+"""
+import asyncio
+import logging
+import os
+import time
+from http.client import responses
+from . import helper
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_async_client(config):
+    """Fetches the httpx.AsyncClient associated with the given config,
+    initializing it if this is the first request (or the first since the
+    process was forked). The client mirrors the settings helper.get_session
+    applies to the synchronous session.
+
+    Arguments:
+        config (Config): The config whose client should be fetched
+
+    Returns:
+        The httpx.AsyncClient to perform requests on
+    """
+    if httpx is None:
+        raise ImportError(
+            'the async api requires the optional httpx dependency'
+        )
+    pid = os.getpid()
+    client = getattr(config, '_async_client', None)
+    if client is None or config._async_client_pid != pid:
+        client = httpx.AsyncClient(
+            http2=getattr(config, 'http2', False),
+            verify=config.verify if config.verify is not None else True,
+            timeout=config.timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=config.pool_maxsize,
+                max_keepalive_connections=config.pool_maxsize
+            )
+        )
+        config._async_client = client
+        config._async_client_pid = pid
+    return client
+
+
+async def http_method(method, config, partial_url: str, **kwargs):
+    """The asynchronous counterpart of helper.http_method: performs the
+    request with the given http verb, backing off according to the config
+    and retrying once on a recoverable 401. Authorization itself still goes
+    through the synchronous auth objects - a token refresh blocks the event
+    loop briefly, which only happens when a refresh is actually due.
+    """
+    headers = kwargs.get('headers')
+    authorizing = kwargs.pop('add_authorization', True)
+    reattempted_auth = False
+    if authorizing:
+        if headers is None:
+            headers = config.auth.prebuilt_headers()
+            if headers is None:
+                headers = {}
+                config.auth.authorize(headers, config)
+            kwargs['headers'] = headers
+        else:
+            config.auth.authorize(headers, config)
+    elif headers is None:
+        kwargs['headers'] = {}
+
+    request_number = 1
+    while True:
+        url = config.cluster.select_next_url()
+        if url.endswith('/'):
+            url = url[:-1]
+        if not partial_url.startswith('/'):
+            url += '/'
+        url += partial_url
+
+        request_start_at = time.time()
+        error = None
+        response = None
+        try:
+            response = await get_async_client(config).request(
+                method, url, **kwargs
+            )
+        except httpx.HTTPError as e:
+            error = e
+        request_time_ms = int((time.time() - request_start_at) * 1000)
+
+        if response is not None:
+            logger.info(
+                '(%s ms) COMPLETE: %s %s ||| %s %s; %s bytes',
+                request_time_ms, method.upper(), url,
+                response.status_code,
+                responses.get(response.status_code, 'Unknown Status Code'),
+                len(response.content)
+            )
+
+            if response.status_code < 500:
+                if (authorizing
+                        and response.status_code == 401
+                        and not reattempted_auth
+                        and config.auth.try_recover_auth_failure()):
+                    kwargs['headers'] = dict(kwargs['headers'])
+                    config.auth.authorize(kwargs['headers'], config)
+                    reattempted_auth = True
+                else:
+                    return response
+
+        if error is not None:
+            logger.info(
+                '(%s ms) ERROR: %s %s ||| %s',
+                request_time_ms, method.upper(), url, error
+            )
+
+        delay = config.back_off.get_back_off(request_number)
+        if delay is None:
+            raise Exception(
+                f'Max retries ({request_number - 1}) exceeded '
+                f'for endpoint {partial_url}'
+            )
+        request_number += 1
+        await asyncio.sleep(delay)
+
+
+class AsyncDocument:
+    """The asynchronous interface to a document. Mirrors the networked
+    functions on Document with async def variants; obtained via
+    Document.as_async(). State (body, etag) lives on the wrapped Document,
+    so sync and async calls can be mixed freely on the same instance.
+
+    Attributes:
+        document (Document): The synchronous document this mirrors.
+    """
+    def __init__(self, document):
+        self.document = document
+
+    async def read(self):
+        """Fetches the current value for this document from remote, like
+        Document#read.
+
+        Returns:
+            True if the document was found and loaded from ArangoDB, False
+            if the document did not exist.
+        """
+        doc = self.document
+        resp = await http_method(
+            'get',
+            doc.collection.database.config,
+            ''.join((doc.collection._doc_base, '/', doc.key))
+        )
+        if resp.status_code == 404:
+            doc.body = {}
+            doc.etag = None
+            return False
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'unexpected status code {resp.status_code} for doc read')
+        doc.body = helper.parse_json(resp)['value']
+        doc.etag = helper.etag_of(resp)
+        return True
+
+    async def create(self, ttl='default'):
+        """Creates this document remotely with the current body if it does
+        not exist, like Document#create.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is created, in seconds, or the string 'default' to take
+                the value set in Config, or the value None to never expire.
+
+        Returns:
+            True if the document did not exist and was created, False if the
+            document did exist and was not modified.
+        """
+        doc = self.document
+        assert doc.etag is None
+
+        exp_at = doc._calculate_expires_at_str(ttl)
+        resp = await http_method(
+            'post',
+            doc.collection.database.config,
+            doc.collection._doc_base,
+            json={
+                '_key': doc.key,
+                'expires_at': exp_at,
+                'value': doc.body
+            }
+        )
+        if resp.status_code in (409, 412):
+            return False
+        resp.raise_for_status()
+        if resp.status_code in (201, 202):
+            doc.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {resp.status_code} for create doc')
+
+    async def compare_and_swap(self, ttl='default'):
+        """Updates the remote document to the current body if it still has
+        our etag, like Document#compare_and_swap.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is refreshed in seconds, or the string 'default' to take
+                the value set in Config, or the value None to never expire.
+
+        Returns:
+            True if the remote document matched our etag and was updated, False
+            if the remote document did not match and was not changed.
+        """
+        doc = self.document
+        assert doc.etag is not None
+
+        exp_at = doc._calculate_expires_at_str(ttl)
+        resp = await http_method(
+            'put',
+            doc.collection.database.config,
+            ''.join((doc.collection._doc_base, '/', doc.key)),
+            json={
+                'expires_at': exp_at,
+                'value': doc.body
+            },
+            headers={
+                'If-Match': doc.etag
+            }
+        )
+        if resp.status_code in (412, 404):
+            return False
+        resp.raise_for_status()
+        if resp.status_code in (201, 202):
+            doc.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {resp.status_code} for replace doc')
+
+    async def overwrite(self, ttl='default'):
+        """Updates the remote document to the current body if it exists, like
+        Document#overwrite.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is refreshed in seconds, or the string 'default' to take
+                the value set in Config, or the value None to never expire.
+
+        Returns:
+            True if the remote document existed and was updated, False if the
+            remote document did not exist and was not created.
+        """
+        doc = self.document
+        exp_at = doc._calculate_expires_at_str(ttl)
+        resp = await http_method(
+            'put',
+            doc.collection.database.config,
+            ''.join((doc.collection._doc_base, '/', doc.key)),
+            json={
+                'expires_at': exp_at,
+                'value': doc.body
+            }
+        )
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        if resp.status_code in (201, 202):
+            doc.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {resp.status_code} for replace doc')
+
+    async def create_or_overwrite(self, ttl='default'):
+        """Sets the remote document to the current body regardless of its
+        previous state, like Document#create_or_overwrite.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is refreshed or created in seconds, or the string
+                'default' to take the value set in Config, or the value None to
+                never expire.
+        """
+        doc = self.document
+        exp_at = doc._calculate_expires_at_str(ttl)
+        resp = await http_method(
+            'post',
+            doc.collection.database.config,
+            doc.collection._doc_base + '?overwrite=true',
+            json={
+                '_key': doc.key,
+                'expires_at': exp_at,
+                'value': doc.body
+            }
+        )
+        resp.raise_for_status()
+        if resp.status_code in (201, 202):
+            doc.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {resp.status_code} for create doc')
+
+    async def compare_and_delete(self):
+        """Deletes the remote document if it still has our etag, like
+        Document#compare_and_delete.
+
+        Returns:
+            True if the remote document matched and was deleted. False when the
+            remote document did not match and was not changed.
+        """
+        doc = self.document
+        assert doc.etag is not None
+        resp = await http_method(
+            'delete',
+            doc.collection.database.config,
+            doc._delete_url,
+            headers={
+                'If-Match': doc.etag
+            }
+        )
+        if resp.status_code in (404, 412):
+            return False
+        resp.raise_for_status()
+        if resp.status_code in (200, 202):
+            doc.etag = None
+            return True
+        raise Exception(f'unexpected status code {resp.status_code} for delete doc')
+
+    async def force_delete(self):
+        """Forcibly deletes the remote document, like Document#force_delete.
+
+        Returns:
+            True if the remote document existed and was deleted, False when the
+            remote document did not exist and was not changed.
+        """
+        doc = self.document
+        resp = await http_method(
+            'delete',
+            doc.collection.database.config,
+            doc._delete_url
+        )
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        if resp.status_code in (200, 202):
+            doc.etag = None
+            return True
+        raise Exception(f'unexpected status code {resp.status_code} for delete doc')
+
+
+class AsyncCollection:
+    """The asynchronous interface to a collection. Mirrors the document
+    convenience functions on Collection with async def variants; obtained
+    via Collection.as_async(). Existence management (create_if_not_exists
+    etc.) stays on the synchronous class since it runs once at bootstrap.
+
+    Attributes:
+        collection (Collection): The synchronous collection this mirrors.
+    """
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def read_doc(self, key):
+        """Fetches the body of the document with the given key, like
+        Collection#read_doc.
+
+        Args:
+            key (str): The unique key within this collection for the document
+                to read.
+
+        Returns:
+            Either the dict body of the document or None if the document with
+            that key within this collection does not exist.
+        """
+        coll = self.collection
+        resp = await http_method(
+            'get',
+            coll.database.config,
+            f'/_db/{coll.database.name}/_api/document/{coll.name}/{key}'
+        )
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'Unexpected status code {resp.status_code} for read doc')
+        return helper.parse_json(resp)['value']
+
+    async def create_or_overwrite_doc(self, key, body, ttl='default'):
+        """Ensures that the document at the given key within this collection
+        has the given body and TTL, like Collection#create_or_overwrite_doc.
+
+        Args:
+            key (str): The unique key within this collection for the document
+                to either create or overwrite.
+            body (dict): The new body of the document
+            ttl (str, int, None): Either the string 'default' for the value in
+                Config, and int for time to live in seconds, or None for no
+                expiration time on this document.
+        """
+        coll = self.collection
+        exp_at = coll._calculate_expires_at_str(ttl)
+        resp = await http_method(
+            'post',
+            coll.database.config,
+            (
+                f'/_db/{coll.database.name}'
+                + f'/_api/document/{coll.name}?overwrite=true&silent=true'
+            ),
+            json={'_key': key, 'expires_at': exp_at, 'value': body}
+        )
+        resp.raise_for_status()
+        if resp.status_code not in (201, 202):
+            raise Exception(f'Unexpected status code {resp.status_code} for create doc')
+
+    async def touch_doc(self, key, ttl='default'):
+        """Refreshes the TTL on the given document to the given value, like
+        Collection#touch_doc.
+
+        Args:
+            key (str): The unique key within this collection to touch.
+            ttl (str, int, None): Either the string 'default' for the value in
+                Config, or the time-to-live after touching in seconds, or None
+                to set no expiration time.
+
+        Returns:
+            True if the document existed and had its expiry time modified,
+            False otherwise.
+        """
+        coll = self.collection
+        if not coll._ttl_enabled:
+            return False
+        exp_at = coll._calculate_expires_at_str(ttl)
+        resp = await http_method(
+            'post',
+            coll.database.config,
+            f'/_db/{coll.database.name}/_api/cursor',
+            json={
+                'query': (
+                    'UPDATE @key WITH { expires_at: @exp } IN @@coll '
+                    + 'OPTIONS { ignoreErrors: true } RETURN NEW._key'
+                ),
+                'bindVars': {
+                    'key': key,
+                    'exp': exp_at,
+                    '@coll': coll.name
+                }
+            }
+        )
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        if resp.status_code != 201:
+            raise Exception(f'Unexpected status code {resp.status_code} for touch doc')
+        return bool(helper.parse_json(resp)['result'])
+
+    async def force_delete_doc(self, key):
+        """Delete the document at the given key if it exists, like
+        Collection#force_delete_doc.
+
+        Args:
+            key (str): The unique key within this collection to delete.
+
+        Returns:
+            True if the document existed and was deleted, False when the
+            document did not exist and was not changed.
+        """
+        coll = self.collection
+        resp = await http_method(
+            'delete',
+            coll.database.config,
+            ''.join((coll._doc_base, '/', key, '?silent=true'))
+        )
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        if resp.status_code not in (200, 202):
+            raise Exception(f'Unexpected status code {resp.status_code} for delete doc')
+        return True
@@ -1,514 +1,824 @@
-"""Describes authorization strategies and provides concrete implementations.
-"""
-from dataclasses import dataclass
-import pytypeutils as tus
-import base64
-import threading
-import os
-import json
-import random
-import math
-import uuid
-import time
-from . import helper
-
-
-class Auth:
-    """Describes something which is capable of setting the authentication
-    headers.
-    """
-    def prepare(self, config):
-        """A side-effectful call that sets the state up on this instance so
-        that future requests can be served quickly. Not required to be called.
-        Implementations which use this function should provide the option to
-        use locking mechanisms to ensure thread and process safety.
-
-        @param [Config] config The configuration to use to make any requests
-            if necessary
-        """
-        raise NotImplementedError  # pragma: no cover
-
-    def try_recover_auth_failure(self):
-        """This is called after the server rejects our authorization from this
-        object. Should return True if this believes the problem has been
-        resolved and False otherwise.
-
-        Returns:
-            True if authorization was refreshed and False otherwise
-        """
-        raise NotImplementedError  # pragma: no cover
-
-    def authorize(self, headers, config):
-        """Adds the required authentication headers to the given dict of
-        headers. This may require network requests if this is a stateful
-        authorization (see prepare).
-
-        Arguments:
-            headers (dict): A possible empty dictionary of headers which will
-                be passed to requests.
-            config (Config): The config to use for making any requests required
-                to authorize
-        """
-        raise NotImplementedError  # pragma: no cover
-
-
-class BasicAuth(Auth):
-    """A stateless basic authentication approach, where the username and
-    password are sent along every request.
-
-    Attributes:
-        username (str): The username to authenticate with
-        password (str): The password to authenticate with
-        _header (str): The header we send on each request
-    """
-    def __init__(self, username, password):
-        tus.check(
-            username=(username, str),
-            password=(password, str)
-        )
-        self.username = username
-        self.password = password
-        self._header = 'Basic ' + base64.b64encode(
-            (self.username + ':' + self.password).encode('ascii')
-        ).decode('ascii')
-
-    def prepare(self, config):
-        """Unused"""
-        pass
-
-    def try_recover_auth_failure(self):
-        """There is no state in this object and hence auth failure is not
-        recoverable
-
-        Returns:
-            False
-        """
-        return False
-
-    def authorize(self, headers, config):
-        """Uses the basic authentication strategy to set the Authorization
-        header.
-        """
-        headers['Authorization'] = self._header
-
-
-class StatefulAuth(Auth):
-    """An interface extension to auth to support deep-copying. This will
-    allow a StatefulAuthWrapper to protect against multi-threading.
-    """
-    def copy_and_strip_state(self):
-        """Returns a deep copy of this instance with all the state removed.
-        For example, a JWT strategy would return a new instance with no JWT
-        token initialized."""
-        raise NotImplementedError  # pragma: no cover
-
-
-class StatefulAuthWrapper(Auth):
-    """A concrete implementation of Auth which simply delegates to a stateful
-    auth, except it will check if it's being used in a different thread or
-    process than it was initialized in. If being used in a different process
-    this can safely clean out local state and act as if it's a fresh instance,
-    since by nature of being in a different process we can't interfere with
-    other processes by writing.
-
-    On the other hand when we're being used within the same process but on a
-    different thread this is only able to catch the situation and raise an
-    error since it's the Config instance itself which needs to be replaced
-    to no longer reference this auth. See Config#thread_safe_copy for how
-    to do this.
-
-    Attributes:
-        delegate (StatefulAuth): The real underlying delegate instance
-        pid (int, None): The PID of the process the delegate was initialized
-            in, if it has been initialized already.
-        tid (int, None): The TID of the thread the delegate was initialized in,
-            if it has been initialized already.
-    """
-    def __init__(self, delegate):
-        self.delegate = delegate.copy_and_strip_state()
-        self.pid = None
-        self.tid = None
-
-    def prepare(self, config):
-        """Verify PID and TID then delegate"""
-        self._check_match_affinity()
-        return self.delegate.prepare(config)
-
-    def try_recover_auth_failure(self):
-        """Verify PID and TID then delegate"""
-        self._check_match_affinity()
-        return self.delegate.try_recover_auth_failure()
-
-    def authorize(self, headers, config):
-        """Verify PID and TID then delegate"""
-        self._check_match_affinity()
-        return self.delegate.authorize(headers, config)
-
-    def reset_affinity(self):
-        """Resets the affinity on this instance, stripping state so it can't
-        be harmful."""
-        self.pid = None
-        self.tid = None
-        self.delegate = self.delegate.copy_and_strip_state()
-
-    def _check_match_affinity(self):
-        """Verifies that we are running in our preferred process and thread.
-        If we are being run in the right process but the wrong thread we're
-        in shared memory and the only sane thing to do is raise an error."""
-        if self.pid is None:
-            self.pid = os.getpid()
-            self.tid = threading.get_ident()
-            return
-
-        if os.getpid() != self.pid:
-            self.reset_affinity()
-            return
-
-        if threading.get_ident() != self.tid:
-            raise RuntimeError(
-                'This StatefulAuthWrapper verifies that it is not being used '
-                + 'on different threads or different processes in order to ensure '
-                + 'the authorization approach does not get corrupted. When running '
-                + 'in multiple processes this can be handled automatically by this '
-                + 'instance reinitializing state, as writing to our instance variables '
-                + "won't be replicated across other processes. However, this detected "
-                + f'it was being run on process {self.pid}, thread {self.tid} and is now '
-                + f'being run on the same process but thread {threading.get_ident()}. '
-                + 'This requires that the Config instance itself is replaced using '
-                'Config#thread_safe_copy on the new thread'
-            )
-
-
-@dataclass
-class JWTToken:
-    """Describes a token and the expected expiration time"""
-    token: str
-    expires_at_utc_seconds: float
-
-
-class JWTCache:
-    """Describes an approach for storing a JWT token in a thread-safe and
-    multi-processed-safe way. The more reuse of the token is possible for
-    a given cache the better performance will tend to be on authorization.
-    """
-    def fetch(self):
-        """Attempt to fetch the value from the cache.
-
-        Returns:
-            If the cache has a value, this is the JWTToken in the cache.
-            Otherwise this is None.
-        """
-        raise NotImplementedError  # pragma: no cover
-
-    def try_acquire_lock(self):
-        """Attempt to acquire permission to fetch a new token. This might
-        happen a bit before the token expires so that one instance can
-        refresh the token while the other instances are still using the
-        old one.
-
-        Returns:
-            True if the lock was acquired, False otherwise
-        """
-        raise NotImplementedError  # pragma: no cover
-
-    def try_set(self, token):
-        """Attempt to set the value in the cache to the given token. Only
-        called if we successfully acquired the lock recently. Note that
-        if we fail to set the JWT token in the cache it will still be used
-        by our instance. Hence if this simply returns False it is effectively
-        memory caching.
-
-        Arguments:
-            token (JWTToken): The token that should be set in the cache
-
-        Returns:
-            True if the cache was updated. Otherwise, when we lost access to
-            the lock and hence did nothing, returns False.
-        """
-        raise NotImplementedError  # pragma: no cover
-
-
-class JWTDiskCache(JWTCache):
-    """A disk-based JWT cache which will allow all processes or threads
-    pointing at the same token and lock-file to share a JWT token. This is
-    fairly simple and good enough for the great majority of use-cases.
-
-    Attributes:
-        lock_file (str): The path to the file to use for locking. Will be
-            formatted as url-safe UUID followed by a space and then a
-            float seconds since MS when the lock request occurred. An atomic
-            append occurs and then we look back to verify we weren't beat to
-            the lock. Depends on everyone using the lock file doing the same
-            thing.
-        lock_time_seconds (float): How long we respect locks for. If someone
-            has held the lock for this long we consider it safe to steal.
-        store_file (str): The path to the file used to store the actual JWT
-            alongside some meta info. Stored in json.
-    """
-    def __init__(self, lock_file, lock_time_seconds, store_file):
-        self.lock_file = lock_file
-        self.lock_time_seconds = lock_time_seconds
-        self.store_file = store_file
-
-    def fetch(self):
-        """See JWTCache#fetch"""
-        try:
-            with open(self.store_file, 'r') as fin:
-                str_contents = fin.read()
-        except FileNotFoundError:
-            return None
-
-        try:
-            json_contents = json.loads(str_contents)
-        except json.decoder.JSONDecodeError:
-            # This is a common error if the file was being written to while
-            # we were reading
-            return None
-
-        return JWTToken(
-            token=json_contents['token'],
-            expires_at_utc_seconds=json_contents['expires_at_utc_seconds']
-        )
-
-    def try_acquire_lock(self):
-        """See JWTCache#try_acquire_lock. This is a pessimistic locking tool to
-        avoid blowing up the size of the lock file too quickly"""
-        try_lock_at = time.time()
-        try:
-            with open(self.lock_file, 'r') as fin:
-                line_contents = fin.readlines()
-        except FileNotFoundError:
-            line_contents = None
-
-        num_lines = 0
-        if line_contents:
-            num_lines = len(line_contents)
-            str_last_line = line_contents[-1]
-            if str_last_line.strip() != '':
-                try:
-                    arr_last_line = json.loads(str_last_line)
-                except json.decoder.JSONDecodeError:
-                    # They were still writing; this shouldn't happen since we're
-                    # supposed to do atomic writes :/
-                    import warnings
-                    warnings.warn(
-                        'JWTDiskCache lock file is corrupted. If this file is '
-                        + 'not being manually modified then the OS is not '
-                        + 'performing atomic writes which could lead to '
-                        + 'irrecoverable desync due to write interleaving.',
-                        UserWarning
-                    )
-                    return False
-
-                locked_at = arr_last_line[1]
-                if locked_at > try_lock_at - self.lock_time_seconds:
-                    return False
-
-        lock_uuid = str(uuid.uuid4())
-        row = json.dumps([lock_uuid, try_lock_at]) + "\n"
-
-        # There are no reasons I can think of, which are recoverable, for this
-        # to fail.
-        with open(self.lock_file, 'a') as fout:
-            fout.write(row)
-
-        # Now we try to find our line and see if we won the race. If we won,
-        # we're going to be the line at index num_lines
-        lock_acquired = None
-        with open(self.lock_file, 'r') as fin:
-            for idx, line in enumerate(fin):
-                if idx < num_lines:
-                    continue
-
-                try:
-                    json.loads(line)
-                except json.decoder.JSONDecodeError:
-                    raise Exception(
-                        'OS is not performing atomic small disk writes, '
-                        + 'causing interleaving in the lock-file. This cannot '
-                        + ' be automatically recovered.'
-                    )
-
-                lock_acquired = line == row
-                break
-
-        if lock_acquired is None:
-            # If we got here the lock file was deleted between our write and our
-            # read.
-            return False
-
-        if lock_acquired:
-            if num_lines > 10_000:
-                # We're going to overwrite the file. This is effectively going
-                # to give up our lock for a tiny tiny period of time, so we
-                # have to repeat this process. Luckily with only one line it's
-                # a simpler process
-                with os.open(self.lock_file, 'w') as fout:
-                    fout.write(row)
-
-                with os.open(self.lock_file) as fin:
-                    first_row = fin.readline()
-
-                if first_row != row:
-                    return False
-
-        return lock_acquired
-
-    def try_set(self, token: JWTToken):
-        """See JWTCache#try_set. This cannot fail, assuming that the os
-        performs atomic writes for very small files which are only flushed
-        when closed. This also cannot fail if we still hold the lock. So
-        it would require a cacophony of errors to fail. Furthermore, if it
-        does fail almost certainly it will not lead to parsable json, hence
-        fetch will automatically recover. If it somehow errored every time,
-        we degrade to memory caching"""
-        dict_contents = {
-            'token': token.token,
-            'expires_at_utc_seconds': token.expires_at_utc_seconds
-        }
-        json_contents = json.dumps(dict_contents)
-        with open(self.store_file, 'w') as fout:
-            fout.write(json_contents)
-        return True
-
-
-class JWTAuth(StatefulAuth):
-    """Uses a username and password authentication to acquire a JWT which is
-    used for future requests. A JWT can be more performant than basic auth.
-
-    Attributes:
-        username (str): The username to authenticate with
-        password (str): The password to authenticate with
-        cache (JWTCache, None): The mechanism for caching the token, or None
-            to cache in memory only
-
-        _token (JWTToken, None): The current token we are authenticating with,
-            if we have a token.
-        _forcing_refresh (str, None): Only set if we have a particular JWT token
-            which we are not satisfied with. Otherwise, None.
-    """
-    def __init__(self, username, password, cache):
-        """Initializes authorization to use the given cache in the future. Does
-        not actually attempt to use the cache or initialize the token yet; that
-        will be done on the next prepare or authorize.
-        """
-        tus.check(
-            username=(username, str),
-            password=(password, (str, type(None))),
-            cache=(cache, (JWTCache, type(None)))
-        )
-        self.username = username
-        self.password = password if password is not None else ''
-        self.cache = cache
-        self._token = None
-        self._forcing_refresh = None
-
-    def prepare(self, config):
-        """If this has no token in memory it will attempt to acquire one (first
-        through the cache and then through networking). If it has a token it
-        will consider refreshing it."""
-        if self._token is None:
-            self.try_load_or_refresh_token(config)
-
-        if self._token.expires_at_utc_seconds < time.time() + 60:
-            self.force_refresh_token(config)
-            return
-
-        target_refresh_at = -250_000 * math.log(random.random())
-        if self._token.expires_at_utc_seconds < time.time() + target_refresh_at:
-            self.try_refresh_token(config)
-            return
-
-    def try_recover_auth_failure(self):
-        """If this has an active token it will be cleared and this will return
-        True. Otherwise this will return False."""
-        if self._token is not None:
-            self._forcing_refresh = self._token.token
-            self._token = None
-            return True
-        return False
-
-    def authorize(self, headers, config):
-        """Will attempt to ensure an active token. If this cannot acquire a
-        token, typically due to locking issues, an error will be raised.
-        Otherwise, the 'Authorization' header will be set in the dict of
-        headers to authenticate with the JWT"""
-        self.prepare(config)
-        if self._token is not None:
-            # If the token is None we want them to fail the request and
-            # see that we can't recover in try_recover_auth_failure
-            headers['Authorization'] = f'Bearer {self._token.token}'
-
-    def copy_and_strip_state(self):
-        """Returns a new JWTAuth instance which is exactly how this one was
-        constructed. This must be called if the process is forked or this is
-        accessed in a different thread."""
-        return JWTAuth(self.username, self.password, self.cache)
-
-    def try_load_or_refresh_token(self, config):
-        """Attempt to load the token from catch or fetch it from a network
-        request. This may wait a while."""
-        if self.cache is None:
-            self._token = self.create_jwt_token(config)
-            return
-
-        for i in range(math.ceil(self.cache.lock_time_seconds / 10.0)):
-            self._token = self.cache.fetch()
-            if self._token is not None and self._forcing_refresh != self._token.token:
-                return
-            self._token = None
-            if self.cache.try_acquire_lock():
-                break
-            time.sleep(0.1)
-
-        token = self.create_jwt_token(config)
-        self.cache.try_set(token)
-        self._token = token
-        self._forcing_refresh = None
-
-    def try_refresh_token(self, config):
-        """Attempts to refresh the token. This will do nothing if we fail to
-        acquire the lock."""
-        if self.cache is None:
-            self._token = self.create_jwt_token(config)
-            return
-
-        if not self.cache.try_acquire_lock():
-            return
-
-        token = self.create_jwt_token(config)
-        self.cache.try_set(token)
-        self._token = token
-
-    def force_refresh_token(self, config):
-        if self.cache is None:
-            self._token = self.create_jwt_token(config)
-            return
-
-        acquired_lock = self.cache.try_acquire_lock()
-        token = self.create_jwt_token(config)
-        if acquired_lock:
-            self.cache.try_set(token)
-
-        self._token = token
-
-    def create_jwt_token(self, config) -> JWTToken:
-        """Create a new token through a network request to ArangoDB
-        """
-        resp = helper.http_post(
-            config,
-            '/_open/auth',
-            add_authorization=False,
-            json={
-                'username': self.username,
-                'password': self.password
-            }
-        )
-        resp.raise_for_status()
-        token = resp.json()['jwt']
-        expected_expire_time = time.time() + 60 * 60 * 24 * 30
-
-        return JWTToken(
-            token=token,
-            expires_at_utc_seconds=expected_expire_time
-        )
+"""Describes authorization strategies and provides concrete implementations.
+"""
+import functools
+import pytypeutils as tus
+from collections import OrderedDict
+import base64
+import threading
+import os
+import json
+import random
+import math
+import struct
+import sys
+import uuid
+import time
+from . import checks
+from . import helper
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_AUTH_KEY = sys.intern('Authorization')
+
+_PID = os.getpid()
+"""The current process id. os.getpid() is a syscall and affinity checks run
+on every authorized request, so the pid is cached here and refreshed via an
+at-fork hook, which is the only way it can change."""
+
+
+def _refresh_pid():
+    global _PID
+    _PID = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):  # pragma: no branch
+    os.register_at_fork(after_in_child=_refresh_pid)
+
+_warned_corrupt_store = False
+"""True if we have already warned about a corrupt JWT store file; the warning
+is only interesting once per process."""
+
+_STORE_L1 = OrderedDict()
+"""The parsed JWT store files, shared by every JWTDiskCache in the process
+and keyed by store file path, as (mtime_ns, token, expires_at_utc_seconds)
+tuples. Distinct cache instances pointing at the same file (e.g. configs
+rebuilt from the same environment) reuse each other's parses, so a fetch
+against an unchanged file is a stat plus a dict lookup. Bounded to
+_STORE_L1_MAXSIZE paths, least recently used evicted first."""
+
+_STORE_L1_MAXSIZE = 32
+"""How many store file paths _STORE_L1 remembers. Processes normally talk
+to one store file; this just keeps pathological churn bounded."""
+
+_STORE_L1_LOCK = threading.Lock()
+"""Guards _STORE_L1."""
+
+
+class Auth:
+    """Describes something which is capable of setting the authentication
+    headers.
+    """
+    __slots__ = ()
+
+    def prepare(self, config):
+        """A side-effectful call that sets the state up on this instance so
+        that future requests can be served quickly. Not required to be called.
+        Implementations which use this function should provide the option to
+        use locking mechanisms to ensure thread and process safety.
+
+        @param [Config] config The configuration to use to make any requests
+            if necessary
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def try_recover_auth_failure(self):
+        """This is called after the server rejects our authorization from this
+        object. Should return True if this believes the problem has been
+        resolved and False otherwise.
+
+        Returns:
+            True if authorization was refreshed and False otherwise
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def authorize(self, headers, config):
+        """Adds the required authentication headers to the given dict of
+        headers. This may require network requests if this is a stateful
+        authorization (see prepare).
+
+        Arguments:
+            headers (dict): A possible empty dictionary of headers which will
+                be passed to requests.
+            config (Config): The config to use for making any requests required
+                to authorize
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def prebuilt_headers(self):
+        """Returns a reusable dict of headers which is sufficient to authorize
+        a request, or None if authorization requires per-request work. The
+        same dict is returned on every call, so callers which receive one may
+        pass it along directly but must never mutate it.
+
+        Returns:
+            The shared dict of headers or None
+        """
+        return None
+
+    def basic_credentials(self):
+        """Returns the (username, password) pair underlying this auth, for
+        the few ArangoDB endpoints that want credentials in the request body
+        rather than a header (e.g. the users list on database creation).
+
+        Returns:
+            The (username, password) tuple
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+@functools.lru_cache(maxsize=32)
+def _basic_header(username, password):
+    """Formats the Authorization header value for basic auth. Cached since
+    credentials are almost always fixed for the process lifetime but auth
+    instances are recreated on every copy_and_strip_state."""
+    return 'Basic ' + base64.b64encode(
+        (username + ':' + password).encode('ascii')
+    ).decode('ascii')
+
+
+class BasicAuth(Auth):
+    """A stateless basic authentication approach, where the username and
+    password are sent along every request.
+
+    Attributes:
+        username (str): The username to authenticate with
+        password (str): The password to authenticate with
+        _header (str): The header we send on each request
+        _prebuilt (dict): The complete set of headers we contribute, shared
+            across requests so the helper layer can splice it in with a
+            single dict update (or pass it along as-is)
+    """
+    __slots__ = ('username', 'password', '_header', '_prebuilt')
+
+    def __init__(self, username, password):
+        if checks.STRICT:
+            tus.check(
+                username=(username, str),
+                password=(password, str)
+            )
+        self.username = username
+        self.password = password
+        self._header = _basic_header(username, password)
+        self._prebuilt = {_AUTH_KEY: self._header}
+
+    def prepare(self, config):
+        """Unused"""
+        pass
+
+    def try_recover_auth_failure(self):
+        """There is no state in this object and hence auth failure is not
+        recoverable
+
+        Returns:
+            False
+        """
+        return False
+
+    def authorize(self, headers, config):
+        """Uses the basic authentication strategy to set the Authorization
+        header.
+        """
+        headers.update(self._prebuilt)
+
+    def prebuilt_headers(self):
+        """Basic auth sends the same header on every request, so the shared
+        dict is always available."""
+        return self._prebuilt
+
+    def basic_credentials(self):
+        """The credentials this auth was constructed with."""
+        return (self.username, self.password)
+
+
+class StatefulAuth(Auth):
+    """An interface extension to auth to support deep-copying. This will
+    allow a StatefulAuthWrapper to protect against multi-threading.
+    """
+    __slots__ = ()
+
+    def copy_and_strip_state(self):
+        """Returns a deep copy of this instance with all the state removed.
+        For example, a JWT strategy would return a new instance with no JWT
+        token initialized."""
+        raise NotImplementedError  # pragma: no cover
+
+
+class StatefulAuthWrapper(Auth):
+    """A concrete implementation of Auth which simply delegates to a stateful
+    auth, except it will check if it's being used in a different thread or
+    process than it was initialized in. If being used in a different process
+    this can safely clean out local state and act as if it's a fresh instance,
+    since by nature of being in a different process we can't interfere with
+    other processes by writing.
+
+    On the other hand when we're being used within the same process but on a
+    different thread this is only able to catch the situation and raise an
+    error since it's the Config instance itself which needs to be replaced
+    to no longer reference this auth. See Config#thread_safe_copy for how
+    to do this.
+
+    Attributes:
+        delegate (StatefulAuth): The real underlying delegate instance
+        pid (int, None): The PID of the process the delegate was initialized
+            in, if it has been initialized already.
+        tid (int, None): The TID of the thread the delegate was initialized in,
+            if it has been initialized already.
+        _delegate_authorize (callable): The delegate's bound authorize method,
+            cached so the per-request path skips the two attribute lookups.
+            Refreshed whenever the delegate is replaced.
+    """
+    __slots__ = ('delegate', 'pid', 'tid', '_delegate_authorize')
+
+    def __init__(self, delegate):
+        self.delegate = delegate.copy_and_strip_state()
+        self._delegate_authorize = self.delegate.authorize
+        self.pid = None
+        self.tid = None
+
+    def prepare(self, config):
+        """Verify PID and TID then delegate"""
+        self._check_match_affinity()
+        return self.delegate.prepare(config)
+
+    def try_recover_auth_failure(self):
+        """Verify PID and TID then delegate"""
+        self._check_match_affinity()
+        return self.delegate.try_recover_auth_failure()
+
+    def basic_credentials(self):
+        """Delegates; the credentials are fixed at construction, so no
+        affinity check is needed."""
+        return self.delegate.basic_credentials()
+
+    def authorize(self, headers, config, _get_ident=threading.get_ident):
+        """Verify PID and TID then delegate. This wraps every request, so the
+        affinity fast path is inlined and the delegate's method is cached:
+        the common case is two compares and one call rather than three
+        attribute lookups and an extra frame. The mismatch path still goes
+        through _check_match_affinity, which may replace the delegate (and
+        with it the cached method) or raise."""
+        if _get_ident() != self.tid or _PID != self.pid:
+            self._check_match_affinity()
+        return self._delegate_authorize(headers, config)
+
+    def reset_affinity(self):
+        """Resets the affinity on this instance, stripping state so it can't
+        be harmful."""
+        self.pid = None
+        self.tid = None
+        self.delegate = self.delegate.copy_and_strip_state()
+        self._delegate_authorize = self.delegate.authorize
+
+    def _check_match_affinity(self, _get_ident=threading.get_ident):
+        """Verifies that we are running in our preferred process and thread.
+        If we are being run in the right process but the wrong thread we're
+        in shared memory and the only sane thing to do is raise an error.
+
+        get_ident is bound as a default argument since this runs on every
+        request and LOAD_FAST is cheaper than the global+attribute lookups."""
+        tid = _get_ident()
+        if tid == self.tid and _PID == self.pid:
+            return
+
+        if self.pid is None:
+            self.pid = _PID
+            self.tid = tid
+            return
+
+        if _PID != self.pid:
+            self.reset_affinity()
+            return
+
+        if tid != self.tid:
+            raise RuntimeError(
+                'This StatefulAuthWrapper verifies that it is not being used '
+                + 'on different threads or different processes in order to ensure '
+                + 'the authorization approach does not get corrupted. When running '
+                + 'in multiple processes this can be handled automatically by this '
+                + 'instance reinitializing state, as writing to our instance variables '
+                + "won't be replicated across other processes. However, this detected "
+                + f'it was being run on process {self.pid}, thread {self.tid} and is now '
+                + f'being run on the same process but thread {threading.get_ident()}. '
+                + 'This requires that the Config instance itself is replaced using '
+                'Config#thread_safe_copy on the new thread'
+            )
+
+
+class JWTToken:
+    """Describes a token and the expected expiration time. Slotted since
+    expires_at_utc_seconds is compared on the hot path and many short-lived
+    instances come out of the disk cache.
+
+    Attributes:
+        token (str): The JWT itself
+        expires_at_utc_seconds (float): When the token expires in seconds
+            since the unix epoch
+    """
+    __slots__ = ('token', 'expires_at_utc_seconds')
+
+    def __init__(self, token, expires_at_utc_seconds):
+        self.token = token
+        self.expires_at_utc_seconds = expires_at_utc_seconds
+
+
+class JWTCache:
+    """Describes an approach for storing a JWT token in a thread-safe and
+    multi-processed-safe way. The more reuse of the token is possible for
+    a given cache the better performance will tend to be on authorization.
+    """
+    __slots__ = ()
+
+    def fetch(self):
+        """Attempt to fetch the value from the cache.
+
+        Returns:
+            If the cache has a value, this is the JWTToken in the cache.
+            Otherwise this is None.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def try_acquire_lock(self):
+        """Attempt to acquire permission to fetch a new token. This might
+        happen a bit before the token expires so that one instance can
+        refresh the token while the other instances are still using the
+        old one.
+
+        Returns:
+            True if the lock was acquired, False otherwise
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def try_set(self, token):
+        """Attempt to set the value in the cache to the given token. Only
+        called if we successfully acquired the lock recently. Note that
+        if we fail to set the JWT token in the cache it will still be used
+        by our instance. Hence if this simply returns False it is effectively
+        memory caching.
+
+        Arguments:
+            token (JWTToken): The token that should be set in the cache
+
+        Returns:
+            True if the cache was updated. Otherwise, when we lost access to
+            the lock and hence did nothing, returns False.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+class JWTDiskCache(JWTCache):
+    """A disk-based JWT cache which will allow all processes or threads
+    pointing at the same token and lock-file to share a JWT token. This is
+    fairly simple and good enough for the great majority of use-cases.
+
+    Attributes:
+        lock_file (str): The path to the file to use for locking. Will be
+            formatted as url-safe UUID followed by a space and then a
+            float seconds since MS when the lock request occurred. An atomic
+            append occurs and then we look back to verify we weren't beat to
+            the lock. Depends on everyone using the lock file doing the same
+            thing.
+        lock_time_seconds (float): How long we respect locks for. If someone
+            has held the lock for this long we consider it safe to steal.
+        store_file (str): The path to the file used to store the actual JWT
+            alongside its expiry. The layout is an 8-byte little-endian
+            float64 for the expiry in seconds since the epoch, followed by
+            the ascii token. Parses are memoized in the module-level
+            _STORE_L1, shared with every other cache using the same file.
+    """
+    __slots__ = ('lock_file', 'lock_time_seconds', 'store_file')
+
+    def __init__(self, lock_file, lock_time_seconds, store_file):
+        self.lock_file = lock_file
+        self.lock_time_seconds = lock_time_seconds
+        self.store_file = store_file
+
+    def fetch(self):
+        """See JWTCache#fetch. This is called in a polling loop while waiting
+        on whoever holds the lock, so the parsed contents are memoized against
+        the store file's mtime in the process-wide _STORE_L1: repeat calls
+        from any instance cost a stat plus a dict lookup instead of an
+        open+read+parse."""
+        try:
+            mtime_ns = os.stat(self.store_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with _STORE_L1_LOCK:
+            entry = _STORE_L1.get(self.store_file)
+            if entry is not None and entry[0] == mtime_ns:
+                _STORE_L1.move_to_end(self.store_file)
+                return JWTToken(
+                    token=entry[1],
+                    expires_at_utc_seconds=entry[2]
+                )
+
+        try:
+            with open(self.store_file, 'rb') as fin:
+                data = fin.read()
+        except FileNotFoundError:
+            return None
+
+        if len(data) <= 8:
+            # try_set replaces atomically, so a short file is corruption
+            # (e.g. manual tampering), not a torn write we raced
+            global _warned_corrupt_store
+            if not _warned_corrupt_store:
+                _warned_corrupt_store = True
+                import warnings
+                warnings.warn(
+                    'JWTDiskCache store file is corrupted; it will be '
+                    + 'rewritten on the next successful refresh.',
+                    UserWarning
+                )
+            return None
+
+        token = data[8:].decode('ascii', 'replace')
+        expires_at = struct.unpack_from('<d', data)[0]
+        with _STORE_L1_LOCK:
+            _STORE_L1[self.store_file] = (mtime_ns, token, expires_at)
+            _STORE_L1.move_to_end(self.store_file)
+            while len(_STORE_L1) > _STORE_L1_MAXSIZE:
+                _STORE_L1.popitem(last=False)
+
+        return JWTToken(
+            token=token,
+            expires_at_utc_seconds=expires_at
+        )
+
+    def try_acquire_lock(self):
+        """See JWTCache#try_acquire_lock. Where fcntl is available (POSIX)
+        the lease row in the lock file is guarded with a single non-blocking
+        flock, making each attempt one open plus one syscall. Elsewhere this
+        falls back to an append-and-rescan protocol on the same file, which
+        costs several reads and grows the file until it's truncated."""
+        if fcntl is not None:
+            return self._try_acquire_lock_flock()
+        return self._try_acquire_lock_append()
+
+    def _try_acquire_lock_flock(self):
+        """Lock acquisition via a non-blocking flock over the lease file. The
+        flock only guards the read-modify-write of the lease row; the lease
+        itself is still the timestamp, so crashed holders expire after
+        lock_time_seconds just like in the append protocol."""
+        try_lock_at = time.time()
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # somebody else is acquiring right now
+                return False
+
+            try:
+                # the file only ever holds one small lease row
+                line = os.read(fd, 4096).decode('utf-8', 'replace')
+                if line.strip() != '':
+                    try:
+                        locked_at = json.loads(line)[1]
+                    except json.decoder.JSONDecodeError:
+                        locked_at = None
+                    if (
+                        locked_at is not None
+                        and locked_at > try_lock_at - self.lock_time_seconds
+                    ):
+                        return False
+
+                row = json.dumps([str(uuid.uuid4()), try_lock_at]) + "\n"
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, row.encode('ascii'))
+                return True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _try_acquire_lock_append(self):
+        """Lock acquisition via atomic appends: write our lease row, then
+        re-read to check nobody beat us to it. This is a pessimistic locking
+        tool to avoid blowing up the size of the lock file too quickly"""
+        try_lock_at = time.time()
+        try:
+            with open(self.lock_file, 'r') as fin:
+                line_contents = fin.readlines()
+        except FileNotFoundError:
+            line_contents = None
+
+        num_lines = 0
+        if line_contents:
+            num_lines = len(line_contents)
+            str_last_line = line_contents[-1]
+            if str_last_line.strip() != '':
+                try:
+                    arr_last_line = json.loads(str_last_line)
+                except json.decoder.JSONDecodeError:
+                    # They were still writing; this shouldn't happen since we're
+                    # supposed to do atomic writes :/
+                    import warnings
+                    warnings.warn(
+                        'JWTDiskCache lock file is corrupted. If this file is '
+                        + 'not being manually modified then the OS is not '
+                        + 'performing atomic writes which could lead to '
+                        + 'irrecoverable desync due to write interleaving.',
+                        UserWarning
+                    )
+                    return False
+
+                locked_at = arr_last_line[1]
+                if locked_at > try_lock_at - self.lock_time_seconds:
+                    return False
+
+        lock_uuid = str(uuid.uuid4())
+        row = json.dumps([lock_uuid, try_lock_at]) + "\n"
+
+        # The byte offset our row lands at if nobody beats us to the append.
+        # Remembering it means the re-read below checks a single line rather
+        # than rescanning the whole file, which matters once it has grown
+        # toward the truncation threshold.
+        try:
+            append_offset = os.path.getsize(self.lock_file)
+        except FileNotFoundError:
+            append_offset = 0
+
+        # There are no reasons I can think of, which are recoverable, for this
+        # to fail.
+        with open(self.lock_file, 'a') as fout:
+            fout.write(row)
+
+        # Now we see if we won the race. Appends are atomic, so whatever line
+        # starts at append_offset belongs to whoever won; if the file was
+        # deleted between our write and our read this reads empty, which also
+        # means we did not acquire the lock.
+        try:
+            with open(self.lock_file, 'rb') as fin:
+                fin.seek(append_offset)
+                first_new_line = fin.readline()
+        except FileNotFoundError:
+            return False
+
+        lock_acquired = first_new_line == row.encode('ascii')
+
+        if lock_acquired and num_lines > 10_000:
+            # Truncate the file down to just our lease row. Writing a sibling
+            # temp file and renaming it over the lock file is atomic at the
+            # VFS layer, so unlike an in-place rewrite we never give up the
+            # lock and need no read-back to confirm we still hold it.
+            tmp_file = f'{self.lock_file}.{os.getpid()}.tmp'
+            with open(tmp_file, 'w') as fout:
+                fout.write(row)
+            os.replace(tmp_file, self.lock_file)
+
+        return lock_acquired
+
+    def try_set(self, token: JWTToken):
+        """See JWTCache#try_set. The record is packed as an 8-byte
+        little-endian float64 expiry followed by the ascii token - no json
+        round trip - written to a sibling temp file and moved into place
+        with os.replace, which is atomic at the VFS layer. Readers can
+        therefore never observe a partial write."""
+        payload = (
+            struct.pack('<d', token.expires_at_utc_seconds)
+            + token.token.encode('ascii')
+        )
+        tmp_file = f'{self.store_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'wb') as fout:
+            fout.write(payload)
+        os.replace(tmp_file, self.store_file)
+        return True
+
+
+class JWTAuth(StatefulAuth):
+    """Uses a username and password authentication to acquire a JWT which is
+    used for future requests. A JWT can be more performant than basic auth.
+
+    Attributes:
+        username (str): The username to authenticate with
+        password (str): The password to authenticate with
+        cache (JWTCache, None): The mechanism for caching the token, or None
+            to cache in memory only
+
+        _token (JWTToken, None): The current token we are authenticating with,
+            if we have a token.
+        _bearer (str, None): The precomputed Authorization header value for
+            _token, so it isn't rebuilt on every request. None iff _token is
+            None.
+        _force_refresh_at (float): The time in seconds since the epoch after
+            which the token must be refreshed before use. Only meaningful
+            while _token is set.
+        _try_refresh_at (float): The time in seconds since the epoch after
+            which we volunteer to refresh the token early. Randomized per
+            token so instances sharing a cache spread their refreshes out,
+            rolled once when the token is set rather than on every request.
+            Never later than _force_refresh_at.
+        _forcing_refresh (str, None): Only set if we have a particular JWT token
+            which we are not satisfied with. Otherwise, None.
+    """
+    __slots__ = (
+        'username', 'password', 'cache', '_token', '_bearer',
+        '_force_refresh_at', '_try_refresh_at', '_forcing_refresh'
+    )
+
+    def __init__(self, username, password, cache):
+        """Initializes authorization to use the given cache in the future. Does
+        not actually attempt to use the cache or initialize the token yet; that
+        will be done on the next prepare or authorize.
+        """
+        if checks.STRICT:
+            tus.check(
+                username=(username, str),
+                password=(password, (str, type(None))),
+                cache=(cache, (JWTCache, type(None)))
+            )
+        self.username = username
+        self.password = password if password is not None else ''
+        self.cache = cache
+        self._token = None
+        self._bearer = None
+        self._force_refresh_at = 0.0
+        self._try_refresh_at = 0.0
+        self._forcing_refresh = None
+
+    def prepare(self, config):
+        """If this has no token in memory it will attempt to acquire one (first
+        through the cache and then through networking). If it has a token it
+        will consider refreshing it."""
+        if self._token is None:
+            self.try_load_or_refresh_token(config)
+
+        now = time.time()
+        if now > self._force_refresh_at:
+            self.force_refresh_token(config)
+            return
+
+        if now > self._try_refresh_at:
+            self.try_refresh_token(config)
+            return
+
+    def try_recover_auth_failure(self):
+        """If this has an active token it will be cleared and this will return
+        True. Otherwise this will return False."""
+        if self._token is not None:
+            self._forcing_refresh = self._token.token
+            self._set_token(None)
+            return True
+        return False
+
+    def authorize(self, headers, config, _time=time.time):
+        """Will attempt to ensure an active token. If this cannot acquire a
+        token, typically due to locking issues, an error will be raised.
+        Otherwise, the 'Authorization' header will be set in the dict of
+        headers to authenticate with the JWT. time.time is bound as a default
+        argument since this runs on every request."""
+        if self._token is not None and _time() < self._try_refresh_at:
+            # the common case: the in-memory token is valid and not near any
+            # refresh threshold, so authorizing is just this dict store
+            headers[_AUTH_KEY] = self._bearer
+            return
+
+        self.prepare(config)
+        if self._token is not None:
+            # If the token is None we want them to fail the request and
+            # see that we can't recover in try_recover_auth_failure
+            headers[_AUTH_KEY] = self._bearer
+
+    def copy_and_strip_state(self):
+        """Returns a new JWTAuth instance which is exactly how this one was
+        constructed. This must be called if the process is forked or this is
+        accessed in a different thread."""
+        return JWTAuth(self.username, self.password, self.cache)
+
+    def basic_credentials(self):
+        """The credentials this auth acquires its tokens with."""
+        return (self.username, self.password)
+
+    def _set_token(self, token):
+        """Sets the current token alongside the precomputed Authorization
+        header value and refresh thresholds, so per-request work is a couple
+        of float compares and a dict store rather than string formatting and
+        a randomness roll."""
+        self._token = token
+        if token is None:
+            self._bearer = None
+            self._force_refresh_at = 0.0
+            self._try_refresh_at = 0.0
+            return
+
+        self._bearer = 'Bearer ' + token.token
+        self._force_refresh_at = token.expires_at_utc_seconds - 60
+        target_refresh_at = -250_000 * math.log(random.random())
+        self._try_refresh_at = min(
+            token.expires_at_utc_seconds - target_refresh_at,
+            self._force_refresh_at
+        )
+
+    def try_load_or_refresh_token(self, config):
+        """Attempt to load the token from catch or fetch it from a network
+        request. This may wait a while."""
+        if self.cache is None:
+            self._set_token(self.create_jwt_token(config))
+            return
+
+        self._set_token(None)
+        # same overall wait budget as the old fixed 100ms poll, but starting
+        # at 10ms with exponential back-off: a peer that publishes quickly is
+        # noticed almost immediately, and each fetch() is just a stat thanks
+        # to its mtime memoization
+        deadline = (
+            time.time() + math.ceil(self.cache.lock_time_seconds / 10.0) * 0.1
+        )
+        delay = 0.01
+        while True:
+            token = self.cache.fetch()
+            if token is not None and self._forcing_refresh != token.token:
+                self._set_token(token)
+                return
+            if self.cache.try_acquire_lock():
+                break
+            if time.time() + delay > deadline:
+                break
+            time.sleep(delay)
+            delay = min(delay * 1.5, 0.2)
+
+        token = self.create_jwt_token(config)
+        self.cache.try_set(token)
+        self._set_token(token)
+        self._forcing_refresh = None
+
+    def try_refresh_token(self, config):
+        """Attempts to refresh the token. If the lock can't be acquired
+        someone else is refreshing; adopt their token from the cache if it's
+        already there rather than doing nothing."""
+        if self.cache is None:
+            self._set_token(self.create_jwt_token(config))
+            return
+
+        if not self.cache.try_acquire_lock():
+            fetched = self.cache.fetch()
+            if (
+                fetched is not None
+                and (self._token is None or fetched.token != self._token.token)
+            ):
+                self._set_token(fetched)
+            elif self._token is not None:
+                # the holder hasn't published their token yet. Push the
+                # voluntary threshold past their lease rather than leaving it
+                # in the past, which would repeat this lock attempt on every
+                # request until the forced refresh.
+                self._try_refresh_at = min(
+                    time.time() + self.cache.lock_time_seconds,
+                    self._force_refresh_at
+                )
+            return
+
+        token = self.create_jwt_token(config)
+        self.cache.try_set(token)
+        self._set_token(token)
+
+    def force_refresh_token(self, config):
+        """Refreshes the token. If the lock can't be acquired someone else is
+        presumably refreshing already, so this polls the cache for their
+        fresh token before falling back to creating a duplicate one over the
+        network - JWT creation is the heaviest call in this module and under
+        contention every instance used to make it simultaneously."""
+        if self.cache is None:
+            self._set_token(self.create_jwt_token(config))
+            return
+
+        old_token = (
+            self._token.token if self._token is not None else self._forcing_refresh
+        )
+        acquired_lock = self.cache.try_acquire_lock()
+        if not acquired_lock:
+            for i in range(math.ceil(self.cache.lock_time_seconds / 10.0)):
+                fetched = self.cache.fetch()
+                if (
+                    fetched is not None
+                    and fetched.token != old_token
+                    and fetched.expires_at_utc_seconds > time.time() + 60
+                ):
+                    self._set_token(fetched)
+                    return
+                if self.cache.try_acquire_lock():
+                    acquired_lock = True
+                    break
+                time.sleep(0.1)
+
+        token = self.create_jwt_token(config)
+        if acquired_lock:
+            self.cache.try_set(token)
+
+        self._set_token(token)
+
+    def create_jwt_token(self, config) -> JWTToken:
+        """Create a new token through a network request to ArangoDB
+        """
+        resp = helper.http_post(
+            config,
+            '/_open/auth',
+            add_authorization=False,
+            json={
+                'username': self.username,
+                'password': self.password
+            }
+        )
+        resp.raise_for_status()
+        token = helper.parse_json(resp)['jwt']
+        expected_expire_time = time.time() + 60 * 60 * 24 * 30
+
+        return JWTToken(
+            token=token,
+            expires_at_utc_seconds=expected_expire_time
+        )
@@ -1,41 +1,50 @@
-"""Describes an object that describes how to back-off if the cluster is having
-issues and provides a concrete implementation."""
-import pytypeutils as tus
-
-
-class BackOffStrategy:
-    """Describes the interface for backing off from a cluster. These instances
-    must be stateless or detect multi-threading / forking"""
-    def get_back_off(self, num_failed_requests):
-        """Returns how much to back off from the server if we have failed the
-        given number of requests due to server or network issues so far for
-        this request.
-
-        Returns:
-            Either a float which is the number of seconds to sleep before
-            attempting the request again or None to raise an error.
-        """
-        raise NotImplementedError  # pragma: no cover
-
-
-class StepBackOffStrategy(BackOffStrategy):
-    """Describes an extremely easy to understand approach - a direct mapping
-    between the number of failed requests and a time to sleep. Once we exhaust
-    the mapping we return None, which raises an error.
-
-    Attributes:
-        steps (list[float]): At index 0 is the back-off for 1 failed request,
-            etc. If this has 2 elements, there will be 3 retries.
-    """
-    def __init__(self, steps):
-        tus.check(steps=(steps, (list, tuple)))
-        tus.check_listlike(steps=(steps, (int, float)))
-        self.steps = [float(step) for step in steps]
-
-    def get_back_off(self, num_failed_requests):
-        tus.check(num_failed_requests=(num_failed_requests, int))
-        if num_failed_requests <= 0:
-            raise ValueError('Backoff only makes sense after failed requests!')
-        if num_failed_requests <= len(self.steps):
-            return self.steps[num_failed_requests - 1]
-        return None
+"""Describes an object that describes how to back-off if the cluster is having
+issues and provides a concrete implementation."""
+import pytypeutils as tus
+from . import checks
+
+
+class BackOffStrategy:
+    """Describes the interface for backing off from a cluster. These instances
+    must be stateless or detect multi-threading / forking"""
+    __slots__ = ()
+
+    def get_back_off(self, num_failed_requests):
+        """Returns how much to back off from the server if we have failed the
+        given number of requests due to server or network issues so far for
+        this request.
+
+        Returns:
+            Either a float which is the number of seconds to sleep before
+            attempting the request again or None to raise an error.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+class StepBackOffStrategy(BackOffStrategy):
+    """Describes an extremely easy to understand approach - a direct mapping
+    between the number of failed requests and a time to sleep. Once we exhaust
+    the mapping we return None, which raises an error.
+
+    Attributes:
+        steps (tuple[float]): At index 0 is the back-off for 1 failed request,
+            etc. If this has 2 elements, there will be 3 retries.
+        _n (int): The number of steps
+    """
+    __slots__ = ('steps', '_n')
+
+    def __init__(self, steps):
+        if checks.STRICT:
+            tus.check(steps=(steps, (list, tuple)))
+            tus.check_listlike(steps=(steps, (int, float)))
+        self.steps = tuple(float(step) for step in steps)
+        self._n = len(self.steps)
+
+    def get_back_off(self, num_failed_requests):
+        # validated in __init__ instead of per retry; this runs on every
+        # failed request
+        if num_failed_requests <= 0:
+            raise ValueError('Backoff only makes sense after failed requests!')
+        if num_failed_requests <= self._n:
+            return self.steps[num_failed_requests - 1]
+        return None
@@ -0,0 +1,12 @@
+"""Internal switch for the pytypeutils validation performed by constructors.
+
+The checks reflect on types and iterate list-likes, so for things like a
+cluster with many coordinator urls they are O(n) per construction.
+Deployments that trust their configuration can skip them by setting the
+environment variable ARANGO_CRUD_STRICT to '0'; any other value, or leaving
+it unset, keeps them on.
+"""
+import os
+
+STRICT = os.environ.get('ARANGO_CRUD_STRICT', '1') != '0'
+"""True if constructors should validate their arguments with pytypeutils."""
@@ -1,75 +1,113 @@
-"""Describes an object responsible for distributing requests to a cluster as
-well as various common concrete implementations.
-"""
-import pytypeutils as tus
-import random
-
-
-class Cluster:
-    """Describes the interface for a cluster. This is something which is
-    capable of selecting a URL to direct requests to. Cluster instances
-    should be stateless."""
-    def select_next_url(self):
-        """Returns the URL to a coordinator in the cluster which the next
-        request will be sent to.
-
-        Returns:
-            The str url to a coordinator not suffixed with a slash. For
-            example: http://localhost:5289
-        """
-        raise NotImplementedError  # pragma: no cover
-
-
-class WeightedRandomCluster(Cluster):
-    """Describes a cluster where requests are distributed at random according
-    to the given set of probabilities.
-
-    Attributes:
-        urls (list[str]): A list of urls for coordinators within the cluster
-        weights (list[float]): A list of positive floats that corresponds to
-            the weight of the corresponding index in urls. If url A and B are
-            such that A has 2x the weight of B, A will receive 2x the requests
-            of B.
-        _rolling_sum_weights (list[float]): The rolling sums of weights. If
-            weights are 1, 2, 3 then this is 1, 3, 6
-    """
-    def __init__(self, urls, weights):
-        tus.check(urls=(urls, (list, tuple)), weights=(weights, (list, tuple)))
-        tus.check_listlike(urls=(urls, str), weights=(weights, (int, float)))
-
-        self.urls = urls
-        self.weights = [float(w) for w in weights]
-        self._rolling_sum_weights = []
-
-        _sum = 0.0
-        for weight in self.weights:
-            _sum += weight
-            self._rolling_sum_weights.append(_sum)
-
-    def select_next_url(self):
-        choice = random.random() * self._rolling_sum_weights[-1]
-        return next(
-            self.urls[idx]
-            for (idx, roll_sum) in enumerate(self._rolling_sum_weights)
-            if roll_sum >= choice
-        )
-
-
-class RandomCluster(Cluster):
-    """A special case of a weighted random cluster where all the urls have the
-    same weight. Distributes requests uniformly at random to coordinators in
-    the cluster.
-
-    Attributes:
-        urls (list[str]): A list of urls for coordinators within the cluster
-    """
-    def __init__(self, urls):
-        tus.check(urls=(urls, (list, tuple)))
-        tus.check_listlike(urls=(urls, str))
-        if not urls:
-            raise ValueError('need at least one URL')
-        self.urls = urls
-
-    def select_next_url(self):
-        idx = random.randrange(len(self.urls))
-        return self.urls[idx]
+"""Describes an object responsible for distributing requests to a cluster as
+well as various common concrete implementations.
+"""
+import bisect
+import pytypeutils as tus
+import random
+from array import array
+from . import checks
+
+
+class Cluster:
+    """Describes the interface for a cluster. This is something which is
+    capable of selecting a URL to direct requests to. Cluster instances
+    should be stateless."""
+    __slots__ = ()
+
+    def select_next_url(self):
+        """Returns the URL to a coordinator in the cluster which the next
+        request will be sent to.
+
+        Returns:
+            The str url to a coordinator not suffixed with a slash. For
+            example: http://localhost:5289
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+class WeightedRandomCluster(Cluster):
+    """Describes a cluster where requests are distributed at random according
+    to the given set of probabilities.
+
+    Attributes:
+        urls (list[str]): A list of urls for coordinators within the cluster
+        weights (list[float]): A list of positive floats that corresponds to
+            the weight of the corresponding index in urls. If url A and B are
+            such that A has 2x the weight of B, A will receive 2x the requests
+            of B.
+        _rolling_sum_weights (array[float]): The rolling sums of weights. If
+            weights are 1, 2, 3 then this is 1, 3, 6. Stored as a contiguous
+            float64 array.array rather than a list of boxed floats, which is
+            8 bytes per url instead of ~80 and keeps the binary search in
+            select_next_url cache-friendly for large clusters
+        _total (float): The sum of all the weights, i.e., the last rolling sum
+    """
+    __slots__ = ('urls', 'weights', '_rolling_sum_weights', '_total')
+
+    def __init__(self, urls, weights):
+        if checks.STRICT:
+            tus.check(
+                urls=(urls, (list, tuple)),
+                weights=(weights, (list, tuple))
+            )
+            tus.check_listlike(urls=(urls, str), weights=(weights, (int, float)))
+
+        self.urls = urls
+        self.weights = [float(w) for w in weights]
+        self._rolling_sum_weights = array('d')
+
+        _sum = 0.0
+        for weight in self.weights:
+            _sum += weight
+            self._rolling_sum_weights.append(_sum)
+        self._total = _sum
+
+    def select_next_url(self, _random=random.random, _bisect=bisect.bisect_left):
+        # the rolling sums are sorted, so the first index whose rolling sum
+        # is at least the choice can be found with a C-level binary search
+        # rather than a python-level scan; random and bisect are bound as
+        # default arguments since this runs per request
+        choice = _random() * self._total
+        return self.urls[_bisect(self._rolling_sum_weights, choice)]
+
+
+class RandomCluster(Cluster):
+    """A special case of a weighted random cluster where all the urls have the
+    same weight. Distributes requests uniformly at random to coordinators in
+    the cluster.
+
+    Attributes:
+        urls (list[str]): A list of urls for coordinators within the cluster
+        _n (int): The number of urls
+        _select (callable): The zero-argument callable returning the index of
+            the next url; bound once in __init__ so selection avoids the
+            module-global Random's dispatch (and its lock contention) per
+            request.
+    """
+    __slots__ = ('urls', '_n', '_select')
+
+    def __init__(self, urls):
+        if checks.STRICT:
+            tus.check(urls=(urls, (list, tuple)))
+            tus.check_listlike(urls=(urls, str))
+        if not urls:
+            raise ValueError('need at least one URL')
+        self.urls = urls
+        self._n = len(urls)
+
+        rng = random.Random()
+        if self._n == 1:
+            self._select = lambda: 0
+        elif self._n & (self._n - 1) == 0:
+            # a power of two: getrandbits skips randrange's range checks and
+            # rejection logic entirely
+            bits = self._n.bit_length() - 1
+            getrandbits = rng.getrandbits
+            self._select = lambda: getrandbits(bits)
+        else:
+            randrange = rng.randrange
+            n = self._n
+            self._select = lambda: randrange(n)
+
+    def select_next_url(self):
+        return self.urls[self._select()]
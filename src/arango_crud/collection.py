@@ -1,202 +1,683 @@
-"""Provides an object-oriented interface of a Collection within ArangoDB.
-Supports existence checks, creation, and deletion. However most of the time
-it's used for initializing new Documents under this collection. This also
-provides some convenience functions for just read/create-or-overwrite/delete
-flows on documents.
-"""
-import pytypeutils as tus
-from .database import Database
-from . import helper
-
-
-class Collection:
-    """Describes a collection within ArangoDB, which acts as a namespace within
-    the Database for documents.
-
-    Attributes:
-        database (Database): The database this collection resides in.
-        name (str): The name of this collection
-    """
-    def __init__(self, database, name):
-        tus.check(database=(database, Database), name=(name, str))
-        self.database = database
-        self.name = name
-
-    def create_if_not_exists(self, ttl='default'):
-        """If this collection does not exist it is created remotely, otherwise
-        this does nothing.
-
-        Args:
-            ttl (str, int, None): If a string it must be 'default', in which
-                this takes the value in the Config. If this describes a non-
-                None TTL, a TTL index is created on "expires_at" if this
-                collection is created from this call.
-
-        Returns:
-            True if the collection did not exist and was created, False if the
-            collection already existed and was not changed.
-        """
-        tus.check(ttl=(ttl, (str, int, type(None))))
-        if ttl == 'default':
-            ttl = self.database.config.ttl_seconds
-        elif isinstance(ttl, str):
-            raise ValueError(f'ttl must be int, None, or the string \'default\' but got \'{ttl}\'')
-
-        resp = helper.http_post(
-            self.database.config,
-            f'/_db/{self.database.name}/_api/collection',
-            json={
-                'name': self.name
-            }
-        )
-        if resp.status_code == 409:
-            return False
-        resp.raise_for_status()
-        if resp.status_code != 200:
-            raise Exception(f'Unexpected status code {resp.status_code} for create collection')
-
-        if ttl is None:
-            return True
-
-        resp = helper.http_post(
-            self.database.config,
-            f'/_db/{self.database.name}/_api/index?collection={self.name}#ttl',
-            json={
-                'type': 'ttl',
-                'fields': ['expires_at'],
-                'expireAfter': 0
-            }
-        )
-        resp.raise_for_status()
-        if resp.status_code != 201:
-            raise Exception(f'Unexpected status code {resp.status_code} for create index')
-        return True
-
-    def check_if_exists(self):
-        """Check if this collection exists remotely.
-
-        Returns:
-            True if this collection exists remotely, False otherwise.
-        """
-        resp = helper.http_get(
-            self.database.config,
-            f'/_db/{self.database.name}/_api/collection/{self.name}'
-        )
-        if resp.status_code == 404:
-            return False
-        resp.raise_for_status()
-        if resp.status_code != 200:
-            raise Exception(f'Unexpected status code {resp.status_code} for get collection')
-        return True
-
-    def force_delete(self):
-        """Delete this collection if it exists remotely. This will delete all
-        documents within this collection.
-
-        Raises:
-            AssertionError: If config.disable_collection_delete is True or this
-                collection is in config.protected_collections. This is to help
-                protect against developer error and is not meant as a form of
-                security.
-
-        Returns:
-            True if this collection existed and was deleted, False if this
-            collection did not exist.
-        """
-        assert not self.database.config.disable_collection_delete
-        assert self.name not in self.database.config.protected_collections
-
-        resp = helper.http_delete(
-            self.database.config,
-            f'/_db/{self.database.name}/_api/collection/{self.name}',
-        )
-        if resp.status_code == 404:
-            return False
-        resp.raise_for_status()
-        if resp.status_code != 200:
-            raise Exception(f'Unexpected status code {resp.status_code} for drop collection')
-        return True
-
-    def document(self, key):
-        """Initialize a new Document with the given key within this collection.
-        This does not perform any networking.
-
-        Args:
-            key (str): The unique key within this collection for the document
-
-        Returns:
-            The Document instance for an object-oriented interface to the given
-            document.
-        """
-        from .document import Document
-        return Document(self, key)
-
-    def create_or_overwrite_doc(self, key, body, ttl='default'):
-        """Ensures that the document at the given key within this collection
-        has the given body and TTL, regardless of the previous state.
-
-        Args:
-            key (str): The unique key within this collection for the document
-                to either create or overwrite.
-            body (dict): The new body of the document
-            ttl (str, int, None): Either the string 'default' for the value in
-                Config, and int for time to live in seconds, or None for no
-                expiration time on this document.
-        """
-        doc = self.document(key)
-        doc.body = body
-        doc.create_or_overwrite(ttl)
-
-    def read_doc(self, key):
-        """Fetches the nody of the document with the given key.
-
-        Args:
-            key (str): The unique key within this collection for the document
-                to read.
-
-        Returns:
-            Either the dict body of the document or None if the document with
-            that key within this collection does not exist.
-        """
-        doc = self.document(key)
-        if doc.read():
-            return doc.body
-        return None
-
-    def touch_doc(self, key, ttl='default'):
-        """Refreshes the TTL on the given document to the given value. This
-        SHOULD not be used to disable/enable expiry times on documents, as it
-        is not concurrency-safe. This SHOULD only be used with a consistent TTL
-        as it is not concurrency-safe otherwise. This will never reset a
-        document to an old version, but it may fail to do anything at all.
-
-        Args:
-            key (str): The unique key within this collection to touch.
-            ttl (str, int, None): Either the string 'default' for the value in
-                Config, or the time-to-live after touching in seconds, or None
-                to set no expiration time.
-
-        Returns:
-            True if the document existed and had its expiry time modified,
-            False when the documetn did not exist or did not have its expiry
-            time modified.
-        """
-        if self.database.config.ttl_seconds is None:
-            return False
-        doc = self.document(key)
-        if not doc.read():
-            return False
-        return doc.compare_and_swap(ttl)
-
-    def force_delete_doc(self, key):
-        """Delete the document at the given key if it exists.
-
-        Args:
-            key (str): The unique key within this collection to delete.
-
-        Returns:
-            True if the document existed and was deleted, False when the
-            document did not exist and was not changed.
-        """
-        doc = self.document(key)
-        return doc.force_delete()
+"""Provides an object-oriented interface of a Collection within ArangoDB.
+Supports existence checks, creation, and deletion. However most of the time
+it's used for initializing new Documents under this collection. This also
+provides some convenience functions for just read/create-or-overwrite/delete
+flows on documents.
+"""
+import pytypeutils as tus
+import threading
+from collections import OrderedDict
+from .database import Database
+from . import checks
+from . import helper
+from datetime import datetime, timedelta, timezone
+
+_EXISTS_CACHE = set()
+"""The (database name, collection name) pairs known to exist remotely.
+Positive results only - a miss always goes to the network - so a stale entry
+can only arise from a deletion, and the force_delete calls in this package
+invalidate it. Deletions performed outside this process are invisible to it,
+which matches how collections are typically bootstrapped once and kept."""
+
+_EXISTS_CACHE_LOCK = threading.Lock()
+"""Guards writes to _EXISTS_CACHE; membership tests are safe without it."""
+
+_DOC_CLS = None
+"""The Document class, cached on first use. The import has to be deferred to
+break the circular dependency with document.py, but re-importing per
+document() call would take the import lock each time."""
+
+DEFAULT_TTL = object()
+"""Sentinel meaning "use the ttl_seconds from the Config". It is the default
+for every ttl argument and resolves with one identity compare; the string
+'default' remains accepted and means the same thing."""
+
+
+def invalidate_exists_cache(database_name, collection_name=None):
+    """Forgets the cached existence of the given collection, or of every
+    collection within the given database when collection_name is None (e.g.
+    because the whole database was deleted).
+
+    Args:
+        database_name (str): The name of the database
+        collection_name (str, None): The name of the collection within that
+            database, or None for all of them
+    """
+    with _EXISTS_CACHE_LOCK:
+        if collection_name is not None:
+            _EXISTS_CACHE.discard((database_name, collection_name))
+        else:
+            stale = [key for key in _EXISTS_CACHE if key[0] == database_name]
+            for key in stale:
+                _EXISTS_CACHE.discard(key)
+
+
+class Collection:
+    """Describes a collection within ArangoDB, which acts as a namespace within
+    the Database for documents.
+
+    Attributes:
+        database (Database): The database this collection resides in.
+        name (str): The name of this collection
+
+        _coll_url (str): The partial url for collection-level operations
+        _doc_base (str): The partial url document operations are built from
+        _doc_overwrite_url (str): The full partial url for single-document
+            create-or-overwrite, query string included
+        _cursor_url (str): The partial url for AQL cursor operations
+        _resolve_ttl (callable): Maps a ttl argument to its effective value,
+            with the config default bound in at construction. Strings other
+            than 'default' pass through for the caller to reject.
+        _ttl_enabled (bool): True if the config has a default ttl, captured
+            at construction so touch_doc can bail without any lookups when
+            ttl is disabled.
+        _can_force_delete (bool): True if the config permits deleting this
+            collection, decided at construction so force_delete is a single
+            assert.
+        _doc_cache (OrderedDict): The config.local_cache_size most recently
+            read documents, key -> (etag, body), so fresh Document instances
+            can revalidate with If-None-Match instead of refetching the full
+            body. Writes from this process invalidate their key; every hit
+            is still revalidated over the network before being trusted.
+        _doc_cache_lock (threading.Lock): Guards _doc_cache.
+    """
+    __slots__ = (
+        'database', 'name', '_coll_url', '_doc_base', '_doc_overwrite_url',
+        '_cursor_url', '_resolve_ttl', '_ttl_enabled', '_can_force_delete',
+        '_doc_cache', '_doc_cache_size', '_doc_cache_lock'
+    )
+
+    def __init__(self, database, name):
+        if checks.STRICT:
+            tus.check(database=(database, Database), name=(name, str))
+        self.database = database
+        self.name = name
+        # every operation needs one of these; formatting them per call adds
+        # up under batch crud
+        self._coll_url = f'/_db/{database.name}/_api/collection/{name}'
+        self._doc_base = f'/_db/{database.name}/_api/document/{name}'
+        self._doc_overwrite_url = self._doc_base + '?overwrite=true&silent=true'
+        self._cursor_url = f'/_db/{database.name}/_api/cursor'
+
+        def _resolve_ttl(ttl, _default=database.config.ttl_seconds):
+            if ttl is DEFAULT_TTL or ttl == 'default':
+                return _default
+            return ttl
+
+        self._resolve_ttl = _resolve_ttl
+        self._ttl_enabled = database.config.ttl_seconds is not None
+        self._can_force_delete = (
+            not database.config.disable_collection_delete
+            and name not in database.config.protected_collections
+        )
+        self._doc_cache = OrderedDict()
+        self._doc_cache_size = getattr(database.config, 'local_cache_size', 256)
+        self._doc_cache_lock = threading.Lock()
+
+    def create_if_not_exists(self, ttl=DEFAULT_TTL):
+        """If this collection does not exist it is created remotely, otherwise
+        this does nothing.
+
+        Args:
+            ttl (str, int, None): If a string it must be 'default', in which
+                this takes the value in the Config. If this describes a non-
+                None TTL, a TTL index is created on "expires_at" if this
+                collection is created from this call.
+
+        Returns:
+            True if the collection did not exist and was created, False if the
+            collection already existed and was not changed.
+        """
+        if checks.STRICT and ttl is not DEFAULT_TTL:
+            tus.check(ttl=(ttl, (str, int, type(None))))
+        ttl = self._resolve_ttl(ttl)
+        if isinstance(ttl, str):
+            raise ValueError(f'ttl must be int, None, or the string \'default\' but got \'{ttl}\'')
+
+        cache_key = (self.database.name, self.name)
+        if cache_key in _EXISTS_CACHE:
+            return False
+
+        resp = helper.http_post(
+            self.database.config,
+            f'/_db/{self.database.name}/_api/collection',
+            json={
+                'name': self.name
+            }
+        )
+        if resp.status_code == 409:
+            with _EXISTS_CACHE_LOCK:
+                _EXISTS_CACHE.add(cache_key)
+            return False
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'Unexpected status code {resp.status_code} for create collection')
+
+        if ttl is None:
+            with _EXISTS_CACHE_LOCK:
+                _EXISTS_CACHE.add(cache_key)
+            return True
+
+        resp = helper.http_post(
+            self.database.config,
+            f'/_db/{self.database.name}/_api/index?collection={self.name}#ttl',
+            json={
+                'type': 'ttl',
+                'fields': ['expires_at'],
+                'expireAfter': 0
+            }
+        )
+        resp.raise_for_status()
+        if resp.status_code != 201:
+            raise Exception(f'Unexpected status code {resp.status_code} for create index')
+        with _EXISTS_CACHE_LOCK:
+            _EXISTS_CACHE.add(cache_key)
+        return True
+
+    def check_if_exists(self):
+        """Check if this collection exists remotely.
+
+        Returns:
+            True if this collection exists remotely, False otherwise.
+        """
+        cache_key = (self.database.name, self.name)
+        if cache_key in _EXISTS_CACHE:
+            return True
+        resp = helper.http_get(
+            self.database.config,
+            self._coll_url
+        )
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'Unexpected status code {resp.status_code} for get collection')
+        with _EXISTS_CACHE_LOCK:
+            _EXISTS_CACHE.add(cache_key)
+        return True
+
+    def force_delete(self):
+        """Delete this collection if it exists remotely. This will delete all
+        documents within this collection.
+
+        Raises:
+            AssertionError: If config.disable_collection_delete is True or this
+                collection is in config.protected_collections. This is to help
+                protect against developer error and is not meant as a form of
+                security.
+
+        Returns:
+            True if this collection existed and was deleted, False if this
+            collection did not exist.
+        """
+        assert self._can_force_delete, f'collection {self.name} is protected'
+
+        invalidate_exists_cache(self.database.name, self.name)
+        resp = helper.http_delete(
+            self.database.config,
+            self._coll_url,
+        )
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'Unexpected status code {resp.status_code} for drop collection')
+        return True
+
+    def document(self, key):
+        """Initialize a new Document with the given key within this collection.
+        This does not perform any networking.
+
+        Args:
+            key (str): The unique key within this collection for the document
+
+        Returns:
+            The Document instance for an object-oriented interface to the given
+            document.
+        """
+        global _DOC_CLS
+        if _DOC_CLS is None:
+            from .document import Document
+            _DOC_CLS = Document
+        return _DOC_CLS(self, key)
+
+    def as_async(self):
+        """Initialize an AsyncCollection over this collection, whose document
+        convenience functions are async def variants suitable for issuing
+        many operations concurrently. This performs no networking. Requires
+        the optional httpx dependency.
+
+        Returns:
+            The AsyncCollection instance mirroring this collection.
+        """
+        from .async_api import AsyncCollection
+        return AsyncCollection(self)
+
+    def _doc_cache_get(self, key):
+        """Fetches the cached (etag, body) pair for the given key if there is
+        one, marking it recently used, or returns None."""
+        if not self._doc_cache_size:
+            return None
+        with self._doc_cache_lock:
+            item = self._doc_cache.get(key)
+            if item is not None:
+                self._doc_cache.move_to_end(key)
+            return item
+
+    def _doc_cache_put(self, key, etag, body):
+        """Remembers the given etag and body for the given key, evicting the
+        least recently used entries beyond the configured size."""
+        if not self._doc_cache_size:
+            return
+        with self._doc_cache_lock:
+            self._doc_cache[key] = (etag, body)
+            self._doc_cache.move_to_end(key)
+            while len(self._doc_cache) > self._doc_cache_size:
+                self._doc_cache.popitem(last=False)
+
+    def _doc_cache_invalidate(self, key):
+        """Forgets the cached etag and body for the given key, if any."""
+        if not self._doc_cache_size:
+            return
+        with self._doc_cache_lock:
+            self._doc_cache.pop(key, None)
+
+    def create_or_overwrite_doc(self, key, body, ttl=DEFAULT_TTL):
+        """Ensures that the document at the given key within this collection
+        has the given body and TTL, regardless of the previous state.
+
+        Args:
+            key (str): The unique key within this collection for the document
+                to either create or overwrite.
+            body (dict): The new body of the document
+            ttl (str, int, None): Either the string 'default' for the value in
+                Config, and int for time to live in seconds, or None for no
+                expiration time on this document.
+        """
+        exp_at = self._calculate_expires_at_str(ttl)
+        self._doc_cache_invalidate(key)
+        resp = helper.http_post(
+            self.database.config,
+            self._doc_overwrite_url,
+            json={'_key': key, 'expires_at': exp_at, 'value': body}
+        )
+        resp.raise_for_status()
+        if resp.status_code not in (201, 202):
+            raise Exception(f'Unexpected status code {resp.status_code} for create doc')
+
+    def read_doc(self, key):
+        """Fetches the nody of the document with the given key.
+
+        Args:
+            key (str): The unique key within this collection for the document
+                to read.
+
+        Returns:
+            Either the dict body of the document or None if the document with
+            that key within this collection does not exist.
+        """
+        resp = helper.http_get(
+            self.database.config,
+            ''.join((self._doc_base, '/', key))
+        )
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'Unexpected status code {resp.status_code} for read doc')
+        return helper.parse_json(resp)['value']
+
+    def create_or_overwrite_docs(self, docs, ttl=DEFAULT_TTL):
+        """Ensures that each document in the given mapping has the given body
+        and TTL, regardless of the previous state, using a single HTTP request
+        rather than one per document.
+
+        Args:
+            docs (dict): A mapping from document keys to the new bodies of the
+                corresponding documents.
+            ttl (str, int, None): Either the string 'default' for the value in
+                Config, an int for time to live in seconds, or None for no
+                expiration time on these documents.
+        """
+        if checks.STRICT:
+            tus.check(docs=(docs, dict))
+        exp_at = self._calculate_expires_at_str(ttl)
+        for key in docs:
+            self._doc_cache_invalidate(key)
+        # silent=true elides the per-document metadata from the response,
+        # which nothing here reads; for large batches that's most of the
+        # response bytes
+        resp = helper.http_post(
+            self.database.config,
+            self._doc_base + '?overwrite=true&silent=true',
+            json=[
+                {'_key': key, 'expires_at': exp_at, 'value': body}
+                for key, body in docs.items()
+            ]
+        )
+        resp.raise_for_status()
+        if resp.status_code not in (201, 202):
+            raise Exception(f'Unexpected status code {resp.status_code} for create docs')
+
+    def read_docs(self, keys):
+        """Fetches the bodies of the documents with the given keys using a
+        single HTTP request rather than one per document.
+
+        Args:
+            keys (list[str]): The keys of the documents to read.
+
+        Returns:
+            A dict mapping each of the given keys to the dict body of the
+            corresponding document, or to None if the document with that key
+            within this collection does not exist.
+        """
+        if checks.STRICT:
+            tus.check(keys=(keys, (list, tuple)))
+            tus.check_listlike(keys=(keys, str))
+        resp = helper.http_put(
+            self.database.config,
+            self._doc_base + '?onlyget=true',
+            json=[{'_key': key} for key in keys]
+        )
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'Unexpected status code {resp.status_code} for read docs')
+
+        result = {}
+        for key, item in zip(keys, helper.parse_json(resp)):
+            if item.get('error'):
+                # 1202 is document-not-found, the only error that just means
+                # None; anything else (e.g. an illegal key) should surface
+                if item.get('errorNum') != 1202:
+                    raise Exception(f'Unexpected error for read doc {key}: {item}')
+                result[key] = None
+            else:
+                result[key] = item['value']
+        return result
+
+    def bulk_create_or_overwrite(self, docs, ttl=DEFAULT_TTL):
+        """Ensures each of the given Documents reflects its local body and the
+        given TTL remotely, using a single HTTP request rather than one per
+        document. Unlike create_or_overwrite_docs this works on Document
+        instances and keeps their etags in sync, so they remain usable for
+        compare_and_swap / compare_and_delete afterward.
+
+        Args:
+            docs (list[Document]): The documents to create or overwrite with
+                their current bodies.
+            ttl (str, int, None): Either the string 'default' for the value in
+                Config, an int for time to live in seconds, or None for no
+                expiration time on these documents.
+        """
+        if checks.STRICT:
+            tus.check(docs=(docs, (list, tuple)))
+        exp_at = self._calculate_expires_at_str(ttl)
+        for doc in docs:
+            self._doc_cache_invalidate(doc.key)
+        resp = helper.http_post(
+            self.database.config,
+            self._doc_base + '?overwrite=true&returnNew=false',
+            json=[
+                {'_key': doc.key, 'expires_at': exp_at, 'value': doc.body}
+                for doc in docs
+            ]
+        )
+        resp.raise_for_status()
+        if resp.status_code not in (201, 202):
+            raise Exception(f'Unexpected status code {resp.status_code} for create docs')
+
+        for doc, item in zip(docs, helper.parse_json(resp)):
+            if item.get('error'):
+                raise Exception(f'Unexpected error for create doc {doc.key}: {item}')
+            doc.etag = item['_rev']
+
+    def bulk_read(self, docs):
+        """Fetches the current remote value of each of the given Documents
+        using a single HTTP request rather than one per document. Each
+        document is updated the way Document#read would: body and etag are
+        overwritten when the document exists remotely, and reset to an empty
+        dict and None when it does not.
+
+        Args:
+            docs (list[Document]): The documents to read into.
+
+        Returns:
+            A list parallel to docs with True where the document was found
+            and loaded from ArangoDB and False where it did not exist.
+        """
+        if checks.STRICT:
+            tus.check(docs=(docs, (list, tuple)))
+        resp = helper.http_put(
+            self.database.config,
+            self._doc_base + '?onlyget=true',
+            json=[{'_key': doc.key} for doc in docs]
+        )
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            raise Exception(f'Unexpected status code {resp.status_code} for read docs')
+
+        result = []
+        for doc, item in zip(docs, helper.parse_json(resp)):
+            if item.get('error'):
+                if item.get('errorNum') != 1202:
+                    raise Exception(f'Unexpected error for read doc {doc.key}: {item}')
+                doc.body = {}
+                doc.etag = None
+                result.append(False)
+            else:
+                doc.body = item['value']
+                doc.etag = item['_rev']
+                result.append(True)
+        return result
+
+    def read_many(self, keys):
+        """Initializes a Document for each of the given keys and loads them
+        all with a single HTTP request, combining document() and bulk_read.
+        Documents whose key does not exist remotely come back the way a
+        failed Document#read leaves them: empty body and no etag.
+
+        Args:
+            keys (list[str]): The keys of the documents to read.
+
+        Returns:
+            A list parallel to keys of Document instances with their bodies
+            and etags loaded from ArangoDB where the documents existed.
+        """
+        if checks.STRICT:
+            tus.check(keys=(keys, (list, tuple)))
+            tus.check_listlike(keys=(keys, str))
+        docs = [self.document(key) for key in keys]
+        self.bulk_read(docs)
+        return docs
+
+    def upsert_many(self, docs, ttl=DEFAULT_TTL):
+        """Creates or replaces each of the given Documents with its local
+        body and the given TTL in a single AQL UPSERT, so the server iterates
+        the array internally instead of this driver issuing one request per
+        document. Etags are assigned from the returned revisions, like
+        bulk_create_or_overwrite; the two differ only in transport, with the
+        AQL form executing as one server-side operation.
+
+        Args:
+            docs (list[Document]): The documents to create or replace with
+                their current bodies.
+            ttl (str, int, None): Either the string 'default' for the value in
+                Config, an int for time to live in seconds, or None for no
+                expiration time on these documents.
+        """
+        if checks.STRICT:
+            tus.check(docs=(docs, (list, tuple)))
+        if not docs:
+            return
+        exp_at = self._calculate_expires_at_str(ttl)
+        for doc in docs:
+            self._doc_cache_invalidate(doc.key)
+        resp = helper.http_post(
+            self.database.config,
+            self._cursor_url,
+            json={
+                'query': (
+                    'FOR d IN @docs UPSERT { _key: d._key } '
+                    + 'INSERT d REPLACE d IN @@coll RETURN NEW._rev'
+                ),
+                'bindVars': {
+                    'docs': [
+                        {'_key': doc.key, 'expires_at': exp_at, 'value': doc.body}
+                        for doc in docs
+                    ],
+                    '@coll': self.name
+                },
+                'batchSize': len(docs)
+            }
+        )
+        resp.raise_for_status()
+        if resp.status_code != 201:
+            raise Exception(f'Unexpected status code {resp.status_code} for upsert docs')
+
+        data = helper.parse_json(resp)
+        revs = data['result']
+        while data.get('hasMore'):
+            # drain the cursor so the server can free it
+            resp = helper.http_put(
+                self.database.config,
+                self._cursor_url + '/' + data['id']
+            )
+            resp.raise_for_status()
+            data = helper.parse_json(resp)
+            revs.extend(data['result'])
+
+        for doc, rev in zip(docs, revs):
+            doc.etag = rev
+
+    def force_delete_docs(self, keys):
+        """Deletes each of the documents with the given keys, if they exist,
+        using a single HTTP request rather than one per document.
+
+        Args:
+            keys (list[str]): The keys of the documents to delete.
+
+        Returns:
+            A dict mapping each of the given keys to True if the document
+            existed and was deleted, or to False if it did not exist.
+        """
+        if checks.STRICT:
+            tus.check(keys=(keys, (list, tuple)))
+            tus.check_listlike(keys=(keys, str))
+        for key in keys:
+            self._doc_cache_invalidate(key)
+        resp = helper.http_delete(
+            self.database.config,
+            self._doc_base + '?ignoreRevs=true',
+            json=list(keys)
+        )
+        resp.raise_for_status()
+        if resp.status_code not in (200, 202):
+            raise Exception(f'Unexpected status code {resp.status_code} for delete docs')
+
+        result = {}
+        for key, item in zip(keys, helper.parse_json(resp)):
+            if item.get('error'):
+                # as in read_docs, 1202 (not found) is the only expected error
+                if item.get('errorNum') != 1202:
+                    raise Exception(f'Unexpected error for delete doc {key}: {item}')
+                result[key] = False
+            else:
+                result[key] = True
+        return result
+
+    def touch_doc(self, key, ttl=DEFAULT_TTL):
+        """Refreshes the TTL on the given document to the given value. The
+        update happens server-side and only modifies expires_at, so the body
+        is never reset to an old version, but concurrent touches with
+        different TTLs can still land in either order.
+
+        Args:
+            key (str): The unique key within this collection to touch.
+            ttl (str, int, None): Either the string 'default' for the value in
+                Config, or the time-to-live after touching in seconds, or None
+                to set no expiration time.
+
+        Returns:
+            True if the document existed and had its expiry time modified,
+            False when the documetn did not exist or did not have its expiry
+            time modified.
+        """
+        if not self._ttl_enabled:
+            return False
+        exp_at = self._calculate_expires_at_str(ttl)
+        # a single AQL UPDATE touches just expires_at server-side, where the
+        # old read + compare-and-swap took two round-trips and could lose the
+        # race in between
+        resp = helper.http_post(
+            self.database.config,
+            self._cursor_url,
+            json={
+                'query': (
+                    'UPDATE @key WITH { expires_at: @exp } IN @@coll '
+                    + 'OPTIONS { ignoreErrors: true } RETURN NEW._key'
+                ),
+                'bindVars': {
+                    'key': key,
+                    'exp': exp_at,
+                    '@coll': self.name
+                }
+            }
+        )
+        if resp.status_code == 404:
+            # the collection does not exist, so neither does the document
+            return False
+        resp.raise_for_status()
+        if resp.status_code != 201:
+            raise Exception(f'Unexpected status code {resp.status_code} for touch doc')
+        return bool(helper.parse_json(resp)['result'])
+
+    def force_delete_doc(self, key):
+        """Delete the document at the given key if it exists. When deleting
+        many documents, force_delete_docs removes them all in one request
+        instead of one round-trip per key.
+
+        Args:
+            key (str): The unique key within this collection to delete.
+
+        Returns:
+            True if the document existed and was deleted, False when the
+            document did not exist and was not changed.
+        """
+        self._doc_cache_invalidate(key)
+        resp = helper.http_delete(
+            self.database.config,
+            ''.join((self._doc_base, '/', key, '?silent=true'))
+        )
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        if resp.status_code not in (200, 202):
+            raise Exception(f'Unexpected status code {resp.status_code} for delete doc')
+        return True
+
+    def _calculate_expires_at_str(
+            self, ttl, _now=datetime.now, _timedelta=timedelta,
+            _utc=timezone.utc):
+        """Calculate the expires at time as an iso-formatted string for the
+        given ttl. This runs on every write, so the datetime machinery is
+        bound as argument defaults.
+
+        Args:
+            ttl (str, int, None): The string 'default', a time in seconds, or
+                None to return None
+
+        Returns:
+            An iso-formatted date time string for expiration if ttl is not None
+            (and either config ttl is not None or ttl is not default)
+        """
+        if checks.STRICT and ttl is not DEFAULT_TTL:
+            tus.check(ttl=(ttl, (str, int, type(None))))
+        ttl = self._resolve_ttl(ttl)
+        if isinstance(ttl, str):
+            raise ValueError(f'ttl should be int, None, or \'default\', got \'{ttl}\'')
+
+        if ttl is None:
+            return None
+
+        # now(utc) is already aware, skipping utcnow's naive -> aware replace
+        return (_now(_utc) + _timedelta(seconds=ttl)).isoformat()
@@ -1,126 +1,217 @@
-"""Completely characterizes how communication with the ArangoDB coordinators
-occurs. This is responsible for authenticating and initializing new Database
-instances with a backwards reference to this configuration.
-"""
-from .auths import Auth, StatefulAuth, StatefulAuthWrapper
-from .clusters import Cluster
-from .back_off_strategies import BackOffStrategy
-import pytypeutils as tus
-
-
-class Config:
-    """Describes how to connect to ArangoDB coordinators. Mainly responsible
-    for authenticating requests and initiating Database instances.
-
-    Attributes:
-        cluster (Cluster): Decides which URL requests go to.
-        timeout_seconds (float): The timeout for requests to the cluster,
-            https://requests.readthedocs.io/en/master/user/quickstart/#timeouts
-        back_off (BackOffStrategy): Decides what to do if a server or network
-            error occurs.
-        ttl_seconds (int, None): The number of seconds by default that objects
-            live. If set to None TTL is disabled and collections are created
-            without TTL indexes. TTL indexes are not modified after creation,
-            so manual intervention is required to change this from None to
-            not-None.
-        auth (Auth): Sets authentication headers.
-        verify (str, None): If specified, then requests should verify certs
-            using the certificate bundle at this path. This is forwarded
-            directly to requests.
-        disable_database_delete (bool): True if database deletes are prevented,
-            False if database deletes are allowed.
-        protected_databases (list[str]): A list of database names which are
-            prevented from deletion. Only has an effect if
-            disable_database_delete is False.
-        disable_collection_delete (bool): True if collection deletes are
-            prevented, False if collection deletes are allowed.
-        protected_collections (list[str]): A list collection names which are
-            prevented from deletion. Only has an effect if
-            disable_collection_delete is False.
-    """
-    def __init__(
-            self, cluster, timeout_seconds, back_off, ttl_seconds, auth,
-            verify=None, disable_database_delete=True, protected_databases=None,
-            disable_collection_delete=True, protected_collections=None):
-        """Initializes Config by setting the corresponding attributes. For
-        auth if it is a StatefulAuth it is wrapped with a StatefulAuthWrapper.
-        """
-        if isinstance(auth, StatefulAuth):
-            auth = StatefulAuthWrapper(auth)
-        if protected_databases is None:
-            protected_databases = []
-        if protected_collections is None:
-            protected_collections = []
-
-        tus.check(
-            cluster=(cluster, Cluster),
-            timeout_seconds=(timeout_seconds, int),
-            back_off=(back_off, BackOffStrategy),
-            ttl_seconds=(ttl_seconds, (int, type(None))),
-            auth=(auth, Auth),
-            verify=(verify, (str, type(None))),
-            disable_database_delete=(disable_database_delete, bool),
-            protected_databases=(protected_databases, (list, tuple)),
-            disable_collection_delete=(disable_collection_delete, bool),
-            protected_collections=(protected_collections, (list, tuple))
-        )
-        tus.check_listlike(
-            protected_databases=(protected_databases, str),
-            protected_collections=(protected_collections, str)
-        )
-
-        self.cluster = cluster
-        self.timeout_seconds = timeout_seconds
-        self.back_off = back_off
-        self.ttl_seconds = ttl_seconds
-        self.auth = auth
-        self.verify = verify
-        self.disable_database_delete = disable_database_delete
-        self.protected_databases = protected_databases
-        self.disable_collection_delete = disable_collection_delete
-        self.protected_collections = protected_collections
-
-    def database(self, name):
-        """Fetch the Database object which acts as interface for using the
-        ArangoDB database with the given name. This performs no networking.
-
-        Arguments:
-            name (str): The name of the database
-
-        Returns:
-            The Database object which provides an interface to the
-            corresponding database on ArangoDB.
-        """
-        from .database import Database
-
-        return Database(self, name)
-
-    def prepare(self):
-        """Performs any initial loading that is required on this configuration.
-        If this is not called directly it will occur on the first request. This
-        loads stateful information, typically JWTs, and hence uses locking
-        mechanisms to maintain thread-safety.
-        """
-        self.auth.prepare(self)
-
-    def thread_safe_copy(self):
-        """Returns a copy of this instance with local variables removed. This
-        should be called whenever a config is suspected be used from a new
-        thread. Note that this is not necessary when forking as that can be
-        detected and handled due to copy-on-write semantics, but it won't
-        hurt. Note that read-only references are still copied by reference."""
-        if isinstance(self.auth, StatefulAuthWrapper):
-            return Config(
-                self.cluster,
-                self.timeout_seconds,
-                self.back_off,
-                self.ttl_seconds,
-                StatefulAuthWrapper(
-                    self.auth.delegate.copy_and_strip_state()
-                ),
-                disable_database_delete=self.disable_database_delete,
-                protected_databases=self.protected_databases,
-                disable_collection_delete=self.disable_collection_delete,
-                protected_collections=self.protected_collections
-            )
-        return self
+"""Completely characterizes how communication with the ArangoDB coordinators
+occurs. This is responsible for authenticating and initializing new Database
+instances with a backwards reference to this configuration.
+"""
+from .auths import Auth, StatefulAuth, StatefulAuthWrapper
+from .clusters import Cluster
+from .back_off_strategies import BackOffStrategy
+from . import checks
+from . import helper
+import pytypeutils as tus
+import threading
+
+
+class Config:
+    """Describes how to connect to ArangoDB coordinators. Mainly responsible
+    for authenticating requests and initiating Database instances.
+
+    Attributes:
+        cluster (Cluster): Decides which URL requests go to.
+        timeout_seconds (float): The timeout for requests to the cluster,
+            https://requests.readthedocs.io/en/master/user/quickstart/#timeouts
+        back_off (BackOffStrategy): Decides what to do if a server or network
+            error occurs.
+        ttl_seconds (int, None): The number of seconds by default that objects
+            live. If set to None TTL is disabled and collections are created
+            without TTL indexes. TTL indexes are not modified after creation,
+            so manual intervention is required to change this from None to
+            not-None.
+        auth (Auth): Sets authentication headers.
+        verify (str, None): If specified, then requests should verify certs
+            using the certificate bundle at this path. This is forwarded
+            directly to requests.
+        disable_database_delete (bool): True if database deletes are prevented,
+            False if database deletes are allowed.
+        protected_databases (frozenset[str]): The database names which are
+            prevented from deletion. Only has an effect if
+            disable_database_delete is False. Accepted as a list or tuple and
+            normalized to a frozenset for O(1) membership checks.
+        disable_collection_delete (bool): True if collection deletes are
+            prevented, False if collection deletes are allowed.
+        protected_collections (frozenset[str]): The collection names which are
+            prevented from deletion. Only has an effect if
+            disable_collection_delete is False. Normalized like
+            protected_databases.
+        pool_maxsize (int): The maximum number of keep-alive connections the
+            session holds per host. Only needs raising when many threads
+            share thread_safe_copy'd configs against the same coordinator.
+        pool_block (bool): If True, threads wait for a pooled connection to
+            free up rather than opening an extra connection that is discarded
+            afterward. Prevents ephemeral-port exhaustion under heavy
+            concurrency at the cost of some waiting.
+        local_cache_size (int): How many recently read documents each
+            Collection remembers locally (etag and body), letting fresh
+            Document instances revalidate with If-None-Match instead of
+            refetching the full body. 0 disables the cache.
+        compress_responses (bool): If True (the default) responses are
+            gzip-compressed by the server, which the http library negotiates
+            and decompresses automatically; json compresses 5-10x, so this
+            is usually a large bandwidth win. Set False on low-latency local
+            links where the decompress CPU costs more than the bytes.
+        thread_local_sessions (bool): If True each thread gets its own
+            session for this config instead of sharing one, so threads
+            sharing a config never contend on a single connection pool's
+            lock. Unnecessary when each thread uses thread_safe_copy, which
+            already gives per-copy sessions.
+        http2 (bool): If True requests are made over HTTP/2 via httpx instead
+            of requests, multiplexing concurrent requests over one
+            connection. Requires the optional httpx[http2] dependency.
+
+        _session (requests.Session, None): The session used for requests with
+            this config so connections are kept alive between requests, once
+            one has been required. Managed by helper.get_session.
+        _session_pid (int, None): The PID of the process _session was
+            initialized in, so forked processes don't share connections.
+        _async_client (httpx.AsyncClient, None): The client for the async
+            API, once one has been required. Managed by
+            async_api.get_async_client.
+        _async_client_pid (int, None): The PID _async_client was initialized
+            in, like _session_pid.
+        _thread_sessions (threading.local, None): Holds each thread's session
+            and the pid it was created in when thread_local_sessions is set,
+            otherwise None. Owned by this config so the sessions are
+            released with it.
+    """
+    __slots__ = (
+        'cluster', 'timeout_seconds', 'back_off', 'ttl_seconds', 'auth',
+        'verify', 'disable_database_delete', 'protected_databases',
+        'disable_collection_delete', 'protected_collections',
+        'pool_maxsize', 'pool_block', 'http2', 'local_cache_size',
+        'compress_responses', 'thread_local_sessions',
+        '_session', '_session_pid', '_async_client', '_async_client_pid',
+        '_thread_sessions'
+    )
+
+    def __init__(
+            self, cluster, timeout_seconds, back_off, ttl_seconds, auth,
+            verify=None, disable_database_delete=True, protected_databases=None,
+            disable_collection_delete=True, protected_collections=None,
+            pool_maxsize=10, pool_block=False, http2=False,
+            local_cache_size=256, compress_responses=True,
+            thread_local_sessions=False):
+        """Initializes Config by setting the corresponding attributes. For
+        auth if it is a StatefulAuth it is wrapped with a StatefulAuthWrapper.
+        """
+        if isinstance(auth, StatefulAuth):
+            auth = StatefulAuthWrapper(auth)
+        if protected_databases is None:
+            protected_databases = []
+        if protected_collections is None:
+            protected_collections = []
+
+        if checks.STRICT:
+            tus.check(
+                cluster=(cluster, Cluster),
+                timeout_seconds=(timeout_seconds, int),
+                back_off=(back_off, BackOffStrategy),
+                ttl_seconds=(ttl_seconds, (int, type(None))),
+                auth=(auth, Auth),
+                verify=(verify, (str, type(None))),
+                disable_database_delete=(disable_database_delete, bool),
+                protected_databases=(
+                    protected_databases, (list, tuple, frozenset)
+                ),
+                disable_collection_delete=(disable_collection_delete, bool),
+                protected_collections=(
+                    protected_collections, (list, tuple, frozenset)
+                ),
+                pool_maxsize=(pool_maxsize, int),
+                pool_block=(pool_block, bool),
+                http2=(http2, bool),
+                local_cache_size=(local_cache_size, int),
+                compress_responses=(compress_responses, bool),
+                thread_local_sessions=(thread_local_sessions, bool)
+            )
+            # check_listlike indexes its argument, so give it a tuple view
+            # in case we were handed a frozenset (e.g. via thread_safe_copy)
+            tus.check_listlike(
+                protected_databases=(tuple(protected_databases), str),
+                protected_collections=(tuple(protected_collections), str)
+            )
+
+        if http2:
+            # fail fast rather than on the first request
+            import httpx  # noqa: F401
+
+        self.cluster = cluster
+        self.timeout_seconds = timeout_seconds
+        self.back_off = back_off
+        self.ttl_seconds = ttl_seconds
+        self.auth = auth
+        self.verify = verify
+        self.disable_database_delete = disable_database_delete
+        self.protected_databases = frozenset(protected_databases)
+        self.disable_collection_delete = disable_collection_delete
+        self.protected_collections = frozenset(protected_collections)
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.http2 = http2
+        self.local_cache_size = local_cache_size
+        self.compress_responses = compress_responses
+        self.thread_local_sessions = thread_local_sessions
+        self._session = None
+        self._session_pid = None
+        self._async_client = None
+        self._async_client_pid = None
+        self._thread_sessions = (
+            threading.local() if thread_local_sessions else None
+        )
+
+    def database(self, name):
+        """Fetch the Database object which acts as interface for using the
+        ArangoDB database with the given name. This performs no networking.
+
+        Arguments:
+            name (str): The name of the database
+
+        Returns:
+            The Database object which provides an interface to the
+            corresponding database on ArangoDB.
+        """
+        from .database import Database
+
+        return Database(self, name)
+
+    def prepare(self):
+        """Performs any initial loading that is required on this configuration.
+        If this is not called directly it will occur on the first request. This
+        loads stateful information, typically JWTs, and hence uses locking
+        mechanisms to maintain thread-safety.
+        """
+        helper.get_session(self)
+        self.auth.prepare(self)
+
+    def thread_safe_copy(self):
+        """Returns a copy of this instance with local variables removed. This
+        should be called whenever a config is suspected be used from a new
+        thread. Note that this is not necessary when forking as that can be
+        detected and handled due to copy-on-write semantics, but it won't
+        hurt. Note that read-only references are still copied by reference."""
+        if not isinstance(self.auth, StatefulAuthWrapper):
+            return self
+        # the arguments were already validated when this instance was built,
+        # so skip __init__ and share the immutable references directly
+        copy = object.__new__(Config)
+        for name in Config.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.auth = StatefulAuthWrapper(
+            self.auth.delegate.copy_and_strip_state()
+        )
+        copy._session = None
+        copy._session_pid = None
+        copy._async_client = None
+        copy._async_client_pid = None
+        copy._thread_sessions = (
+            threading.local() if self.thread_local_sessions else None
+        )
+        return copy
@@ -1,302 +1,416 @@
-"""Describes a single document within ArangoDB. This is what actually stores
-the data. Amounts to a single JSON object with create/read/overwrite/delete
-semantics with optional time-to-live."""
-from .collection import Collection
-from . import helper
-import pytypeutils as tus
-from datetime import datetime, timedelta, timezone
-
-
-class Document:
-    """A document within ArangoDB.
-
-    Attributes:
-        collection (Collection): The collection this document resides in.
-            Should not be modified after initialization.
-        key (str): The key which is used to look this document up. Should not
-            be modified after initialization.
-        body (dict): The body of this document as far as we know. This may not
-            match the ArangoDB version. This is initialized to an empty dict if
-            no network requests are made. This does not include metavalues like
-            _key. May be modified directly with an understanding of how etag's
-            work.
-        etag (str, None): If we've saved to or loaded from the underlying DB,
-            this is the latest version of the document we used. Should not
-            be modified directly.
-    """
-    def __init__(self, collection, key):
-        tus.check(collection=(collection, Collection), key=(key, str))
-        self.collection = collection
-        self.key = key
-        self.etag = None
-        self.body = {}
-
-    def read(self):
-        """Fetches the current value for this document from remote. If this
-        document exists remotely, the body and etag are overwritten and this
-        returns True. If the document does not exist remotely, the body is
-        set to an empty dict, etag is set to None, and this returns False.
-
-        Returns:
-            True if the document was found and loaded from ArangoDB, False
-            if the document did not exist.
-        """
-        resp = helper.http_get(
-            self.collection.database.config,
-            f'/_db/{self.collection.database.name}/_api/document/{self.collection.name}/{self.key}'
-        )
-        if resp.status_code == 404:
-            self.body = {}
-            self.etag = None
-            return False
-        resp.raise_for_status()
-        if resp.status_code != 200:
-            raise Exception(f'unexpected status code {resp.status_code} for doc read')
-        self.body = resp.json()['value']
-        self.etag = resp.headers['etag']
-        return True
-
-    def read_if_remote_newer(self):
-        """If the remote has a different etag than we have locally, this
-        will update body and etag to reflect that new value. If the remote
-        has the same etag as we have locally this does nothing.
-
-        Raises:
-            AssertionError: If this does not have an etag set.
-
-        Returns:
-            True if a newer version of the document was found and loaded from
-            ArangoDB, False if the document did not exist or was at the same
-            version.
-        """
-        assert self.etag is not None
-        resp = helper.http_get(
-            self.collection.database.config,
-            f'/_db/{self.collection.database.name}/_api/document/{self.collection.name}/{self.key}',
-            headers={
-                'If-None-Match': self.etag
-            }
-        )
-        if resp.status_code == 304 or resp.status_code == 404:
-            return False
-        resp.raise_for_status()
-        if resp.status_code != 200:
-            raise Exception(f'unexpected status code {resp.status_code} for get doc with etag')
-        self.body = resp.json()['value']
-        self.etag = resp.headers['etag']
-        return True
-
-    def create(self, ttl='default'):
-        """If this document does not exist remotely it is created with our
-        current body and the specified time to live and this returns True. If
-        the document does exist remotely this does nothing and returns False.
-
-        Raises:
-            AssertionError: If this has an etag set.
-
-        Args:
-            ttl (str, int, None): Should be the time for the document to live
-                if it is created, in seconds, or the string 'default' to take
-                the value set in Config, or the value None to never expire.
-
-        Returns:
-            True if the document did not exist and was created, False if the
-            document did exist and was not modified.
-        """
-        assert self.etag is None
-
-        exp_at = self._calculate_expires_at_str(ttl)
-        resp = helper.http_post(
-            self.collection.database.config,
-            f'/_db/{self.collection.database.name}/_api/document/{self.collection.name}',
-            json={
-                '_key': self.key,
-                'expires_at': exp_at,
-                'value': self.body
-            }
-        )
-        if resp.status_code in (409, 412):
-            return False
-        resp.raise_for_status()
-        if resp.status_code == 201 or resp.status_code == 202:
-            self.etag = resp.headers['etag']
-            return True
-        raise Exception(f'unexpected status code {resp.status_code} for create doc')
-
-    def compare_and_swap(self, ttl='default'):
-        """Performs a compare-and-swap operation. If the remote document exists
-        and has the same etag, the body is updated, the TTL is refreshed, and
-        this returns True. Otherwise, when the remote document either does not
-        exist or is at a different version, this does nothing and returns
-        False.
-
-        Raises:
-            AssertionError: If this does not have an etag set.
-
-        Args:
-            ttl (str, int, None): Should be the time for the document to live
-                if it is refreshed in seconds, or the string 'default' to take
-                the value set in Config, or the value None to never expire.
-
-        Returns:
-            True if the remote document matched our etag and was updated, False
-            if the remote document did not match and was not changed.
-        """
-        assert self.etag is not None
-
-        exp_at = self._calculate_expires_at_str(ttl)
-        resp = helper.http_put(
-            self.collection.database.config,
-            f'/_db/{self.collection.database.name}/_api/document/{self.collection.name}/{self.key}',
-            json={
-                'expires_at': exp_at,
-                'value': self.body
-            },
-            headers={
-                'If-Match': self.etag
-            }
-        )
-        if resp.status_code == 412 or resp.status_code == 404:
-            return False
-        resp.raise_for_status()
-        if resp.status_code == 201 or resp.status_code == 202:
-            self.etag = resp.headers['etag']
-            return True
-        raise Exception(f'unexpected status code {resp.status_code} for replace doc')
-
-    def overwrite(self, ttl='default'):
-        """If this document exists in ArangoDB the body is updated, the TTL is
-        refreshed, and this returns True. Otherwise, when the document does not
-        exist, nothing happens and this returns False.
-
-        Args:
-            ttl (str, int, None): Should be the time for the document to live
-                if it is refreshed in seconds, or the string 'default' to take
-                the value set in Config, or the value None to never expire.
-
-        Returns:
-            True if the remote document existed and was updated, False if the
-            remote document did not exist and was not created.
-        """
-        exp_at = self._calculate_expires_at_str(ttl)
-        resp = helper.http_put(
-            self.collection.database.config,
-            f'/_db/{self.collection.database.name}/_api/document/{self.collection.name}/{self.key}',
-            json={
-                'expires_at': exp_at,
-                'value': self.body
-            }
-        )
-        if resp.status_code == 404:
-            return False
-        resp.raise_for_status()
-        if resp.status_code == 201 or resp.status_code == 202:
-            self.etag = resp.headers['etag']
-            return True
-        raise Exception(f'unexpected status code {resp.status_code} for replace doc')
-
-    def create_or_overwrite(self, ttl='default'):
-        """Regardless of the state of this document in ArangoDB, it will be
-        created or updated to reflect this instances values and the given
-        TTL.
-
-        Args:
-            ttl (str, int, None): Should be the time for the document to live
-                if it is refreshed or created in seconds, or the string
-                'default' to take the value set in Config, or the value None to
-                never expire.
-        """
-        exp_at = self._calculate_expires_at_str(ttl)
-        resp = helper.http_post(
-            self.collection.database.config,
-            (
-                f'/_db/{self.collection.database.name}'
-                + f'/_api/document/{self.collection.name}?overwrite=true'
-            ),
-            json={
-                '_key': self.key,
-                'expires_at': exp_at,
-                'value': self.body
-            }
-        )
-        resp.raise_for_status()
-        if resp.status_code == 201 or resp.status_code == 202:
-            self.etag = resp.headers['etag']
-            return True
-        raise Exception(f'unexpected status code {resp.status_code} for create doc')
-
-    def compare_and_delete(self):
-        """If the remote document exists and has the same etag it is deleted.
-        Otherwise this does nothing.
-
-        Raises:
-            AssertionError: If this does not have an etag set
-
-        Returns:
-            True if the remote document matched and was deleted. False when the
-            remote document did not match and was not changed.
-        """
-        assert self.etag is not None
-        resp = helper.http_delete(
-            self.collection.database.config,
-            (
-                f'/_db/{self.collection.database.name}'
-                + f'/_api/document/{self.collection.name}/{self.key}'
-            ),
-            headers={
-                'If-Match': self.etag
-            }
-        )
-        if resp.status_code == 404 or resp.status_code == 412:
-            return False
-        resp.raise_for_status()
-        if resp.status_code == 200 or resp.status_code == 202:
-            self.etag = None
-            return True
-        raise Exception(f'unexpected status code {resp.status_code} for delete doc')
-
-    def force_delete(self):
-        """Forcibly delete the remote document, without checking its version.
-
-        Returns:
-            True if the remote document existed and was deleted, False when the
-            remote document did not exist and was not changed.
-        """
-        resp = helper.http_delete(
-            self.collection.database.config,
-            (
-                f'/_db/{self.collection.database.name}'
-                + f'/_api/document/{self.collection.name}/{self.key}'
-            )
-        )
-        if resp.status_code == 404:
-            return False
-        resp.raise_for_status()
-        if resp.status_code == 200 or resp.status_code == 202:
-            self.etag = None
-            return True
-        raise Exception(f'unexpected status code {resp.status_code} for delete doc')
-
-    def _calculate_expires_at_str(self, ttl):
-        """Calculate the expires at time as an iso-formatted string for the
-        given ttl.
-
-        Args:
-            ttl (str, int, None): The string 'default', a time in seconds, or
-                None to return None
-
-        Returns:
-            An iso-formatted date time string for expiration if ttl is not None
-            (and either config ttl is not None or ttl is not default)
-        """
-        tus.check(ttl=(ttl, (str, int, type(None))))
-        if ttl == 'default':
-            ttl = self.collection.database.config.ttl_seconds
-        elif isinstance(ttl, str):
-            raise ValueError(f'ttl should be int, None, or \'default\', got \'{ttl}\'')
-
-        if ttl is None:
-            return None
-
-        exp_at = datetime.utcnow() + timedelta(seconds=ttl)
-        return exp_at.replace(tzinfo=timezone.utc).isoformat()
+"""Describes a single document within ArangoDB. This is what actually stores
+the data. Amounts to a single JSON object with create/read/overwrite/delete
+semantics with optional time-to-live."""
+from .collection import Collection, DEFAULT_TTL
+from . import checks
+from . import helper
+import copy
+import pytypeutils as tus
+from datetime import datetime, timedelta, timezone
+
+
+class Document:
+    """A document within ArangoDB.
+
+    Attributes:
+        collection (Collection): The collection this document resides in.
+            Should not be modified after initialization.
+        key (str): The key which is used to look this document up. Should not
+            be modified after initialization.
+        body (dict): The body of this document as far as we know. This may not
+            match the ArangoDB version. This is initialized to an empty dict if
+            no network requests are made. This does not include metavalues like
+            _key. May be modified directly with an understanding of how etag's
+            work.
+        etag (str, None): If we've saved to or loaded from the underlying DB,
+            this is the latest version of the document we used. Should not
+            be modified directly.
+
+        _cfg (Config): The config requests go through, cached from the
+            collection at initialization.
+        _url (str): The partial url for operations on this document.
+        _delete_url (str): _url with silent=true, for the delete operations,
+            which never read the response body.
+    """
+    __slots__ = ('collection', 'key', 'etag', 'body', '_cfg', '_url', '_delete_url')
+
+    def __init__(self, collection, key):
+        if checks.STRICT:
+            tus.check(collection=(collection, Collection), key=(key, str))
+        self.collection = collection
+        self.key = key
+        self.etag = None
+        self.body = {}
+        # every request needs these; resolving them per call costs a handful
+        # of attribute lookups and an f-string on the hottest paths
+        self._cfg = collection.database.config
+        self._url = ''.join((collection._doc_base, '/', key))
+        # deletes ignore the response body, so the server can skip
+        # serializing the deleted document's meta object
+        self._delete_url = self._url + '?silent=true'
+
+    def as_async(self):
+        """Initialize an AsyncDocument over this document, whose networked
+        functions are async def variants suitable for issuing many operations
+        concurrently. This performs no networking. Requires the optional
+        httpx dependency.
+
+        Returns:
+            The AsyncDocument instance mirroring this document.
+        """
+        from .async_api import AsyncDocument
+        return AsyncDocument(self)
+
+    def read(self):
+        """Fetches the current value for this document from remote. If this
+        document exists remotely, the body and etag are overwritten and this
+        returns True. If the document does not exist remotely, the body is
+        set to an empty dict, etag is set to None, and this returns False.
+
+        When an etag is already set it is sent as If-None-Match, so a reread
+        of an unchanged document costs no response body; the local body is
+        already current in that case and this still returns True. A fresh
+        instance without an etag first consults the collection's local cache
+        of recent reads for a candidate to revalidate the same way.
+
+        Returns:
+            True if the document was found and loaded from ArangoDB, False
+            if the document did not exist.
+        """
+        etag = self.etag
+        cached_body = None
+        if etag is None:
+            cached = self.collection._doc_cache_get(self.key)
+            if cached is not None:
+                etag, cached_body = cached
+        kwargs = {}
+        if etag is not None:
+            kwargs['headers'] = {'If-None-Match': etag}
+        resp = helper.http_get(
+            self._cfg,
+            self._url,
+            **kwargs
+        )
+        status = resp.status_code
+        if status == 304:
+            if cached_body is not None:
+                self.body = copy.deepcopy(cached_body)
+                self.etag = etag
+            return True
+        if status == 404:
+            self.collection._doc_cache_invalidate(self.key)
+            self.body = {}
+            self.etag = None
+            return False
+        resp.raise_for_status()
+        if status != 200:
+            raise Exception(f'unexpected status code {status} for doc read')
+        self.body = helper.parse_json(resp)['value']
+        self.etag = helper.etag_of(resp)
+        # store a deep copy so later edits to this instance's body - at any
+        # nesting depth - can't rewrite the cached version and get served
+        # back as if they came from the server
+        self.collection._doc_cache_put(
+            self.key, self.etag, copy.deepcopy(self.body)
+        )
+        return True
+
+    def read_if_remote_newer(self):
+        """If the remote has a different etag than we have locally, this
+        will update body and etag to reflect that new value. If the remote
+        has the same etag as we have locally this does nothing.
+
+        Raises:
+            AssertionError: If this does not have an etag set.
+
+        Returns:
+            True if a newer version of the document was found and loaded from
+            ArangoDB, False if the document did not exist or was at the same
+            version.
+        """
+        assert self.etag is not None
+        resp = helper.http_get(
+            self._cfg,
+            self._url,
+            headers={
+                'If-None-Match': self.etag
+            }
+        )
+        status = resp.status_code
+        if status in (304, 404):
+            return False
+        resp.raise_for_status()
+        if status != 200:
+            raise Exception(f'unexpected status code {status} for get doc with etag')
+        self.body = helper.parse_json(resp)['value']
+        self.etag = helper.etag_of(resp)
+        return True
+
+    def create(self, ttl=DEFAULT_TTL):
+        """If this document does not exist remotely it is created with our
+        current body and the specified time to live and this returns True. If
+        the document does exist remotely this does nothing and returns False.
+
+        Raises:
+            AssertionError: If this has an etag set.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is created, in seconds, or the string 'default' to take
+                the value set in Config, or the value None to never expire.
+
+        Returns:
+            True if the document did not exist and was created, False if the
+            document did exist and was not modified.
+        """
+        assert self.etag is None
+
+        exp_at = self._calculate_expires_at_str(ttl)
+        self.collection._doc_cache_invalidate(self.key)
+        resp = helper.http_post(
+            self._cfg,
+            self.collection._doc_base,
+            json={
+                '_key': self.key,
+                'expires_at': exp_at,
+                'value': self.body
+            }
+        )
+        status = resp.status_code
+        if status in (409, 412):
+            return False
+        resp.raise_for_status()
+        if status in (201, 202):
+            self.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {status} for create doc')
+
+    def compare_and_swap(self, ttl=DEFAULT_TTL):
+        """Performs a compare-and-swap operation. If the remote document exists
+        and has the same etag, the body is updated, the TTL is refreshed, and
+        this returns True. Otherwise, when the remote document either does not
+        exist or is at a different version, this does nothing and returns
+        False.
+
+        Raises:
+            AssertionError: If this does not have an etag set.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is refreshed in seconds, or the string 'default' to take
+                the value set in Config, or the value None to never expire.
+
+        Returns:
+            True if the remote document matched our etag and was updated, False
+            if the remote document did not match and was not changed.
+        """
+        assert self.etag is not None
+
+        exp_at = self._calculate_expires_at_str(ttl)
+        self.collection._doc_cache_invalidate(self.key)
+        resp = helper.http_put(
+            self._cfg,
+            self._url,
+            json={
+                'expires_at': exp_at,
+                'value': self.body
+            },
+            headers={
+                'If-Match': self.etag
+            }
+        )
+        status = resp.status_code
+        if status in (404, 412):
+            return False
+        resp.raise_for_status()
+        if status in (201, 202):
+            self.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {status} for replace doc')
+
+    def overwrite(self, ttl=DEFAULT_TTL):
+        """If this document exists in ArangoDB the body is updated, the TTL is
+        refreshed, and this returns True. Otherwise, when the document does not
+        exist, nothing happens and this returns False.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is refreshed in seconds, or the string 'default' to take
+                the value set in Config, or the value None to never expire.
+
+        Returns:
+            True if the remote document existed and was updated, False if the
+            remote document did not exist and was not created.
+        """
+        exp_at = self._calculate_expires_at_str(ttl)
+        self.collection._doc_cache_invalidate(self.key)
+        resp = helper.http_put(
+            self._cfg,
+            self._url,
+            json={
+                'expires_at': exp_at,
+                'value': self.body
+            }
+        )
+        status = resp.status_code
+        if status == 404:
+            return False
+        resp.raise_for_status()
+        if status in (201, 202):
+            self.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {status} for replace doc')
+
+    def patch(self, changes, ttl=DEFAULT_TTL):
+        """Applies only the given changes to the remote document, refreshing
+        the TTL. Unlike overwrite this ships just the delta over the wire,
+        which matters for large bodies; ArangoDB merges the changes into the
+        stored value server-side (nested objects are merged, not replaced).
+        If an etag is set the patch only applies when the remote document
+        still has that version, like compare_and_swap.
+
+        The local body is updated with the changes on success, which matches
+        the server for flat values but approximates it for nested objects;
+        read() afterward if the exact merged body matters.
+
+        Args:
+            changes (dict): The fields of the body to add or replace.
+            ttl (str, int, None): Should be the time for the document to live
+                after patching in seconds, or the string 'default' to take the
+                value set in Config, or the value None to never expire.
+
+        Returns:
+            True if the remote document existed (and matched our etag, when
+            one is set) and was patched, False when it was not changed.
+        """
+        if checks.STRICT:
+            tus.check(changes=(changes, dict))
+        exp_at = self._calculate_expires_at_str(ttl)
+        self.collection._doc_cache_invalidate(self.key)
+        kwargs = {}
+        if self.etag is not None:
+            kwargs['headers'] = {'If-Match': self.etag}
+        resp = helper.http_patch(
+            self._cfg,
+            self._url + '?mergeObjects=true',
+            json={
+                'expires_at': exp_at,
+                'value': changes
+            },
+            **kwargs
+        )
+        status = resp.status_code
+        if status in (404, 412):
+            return False
+        resp.raise_for_status()
+        if status in (201, 202):
+            self.body.update(changes)
+            self.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {status} for patch doc')
+
+    def create_or_overwrite(self, ttl=DEFAULT_TTL):
+        """Regardless of the state of this document in ArangoDB, it will be
+        created or updated to reflect this instances values and the given
+        TTL.
+
+        Args:
+            ttl (str, int, None): Should be the time for the document to live
+                if it is refreshed or created in seconds, or the string
+                'default' to take the value set in Config, or the value None to
+                never expire.
+        """
+        exp_at = self._calculate_expires_at_str(ttl)
+        self.collection._doc_cache_invalidate(self.key)
+        resp = helper.http_post(
+            self._cfg,
+            self.collection._doc_base + '?overwrite=true',
+            json={
+                '_key': self.key,
+                'expires_at': exp_at,
+                'value': self.body
+            }
+        )
+        status = resp.status_code
+        resp.raise_for_status()
+        if status in (201, 202):
+            self.etag = helper.etag_of(resp)
+            return True
+        raise Exception(f'unexpected status code {status} for create doc')
+
+    def compare_and_delete(self):
+        """If the remote document exists and has the same etag it is deleted.
+        Otherwise this does nothing.
+
+        Raises:
+            AssertionError: If this does not have an etag set
+
+        Returns:
+            True if the remote document matched and was deleted. False when the
+            remote document did not match and was not changed.
+        """
+        assert self.etag is not None
+        self.collection._doc_cache_invalidate(self.key)
+        resp = helper.http_delete(
+            self._cfg,
+            self._delete_url,
+            headers={
+                'If-Match': self.etag
+            }
+        )
+        status = resp.status_code
+        if status in (404, 412):
+            return False
+        resp.raise_for_status()
+        if status in (200, 202):
+            self.etag = None
+            return True
+        raise Exception(f'unexpected status code {status} for delete doc')
+
+    def force_delete(self):
+        """Forcibly delete the remote document, without checking its version.
+
+        Returns:
+            True if the remote document existed and was deleted, False when the
+            remote document did not exist and was not changed.
+        """
+        self.collection._doc_cache_invalidate(self.key)
+        resp = helper.http_delete(
+            self._cfg,
+            self._delete_url
+        )
+        status = resp.status_code
+        if status == 404:
+            return False
+        resp.raise_for_status()
+        if status in (200, 202):
+            self.etag = None
+            return True
+        raise Exception(f'unexpected status code {status} for delete doc')
+
+    def _calculate_expires_at_str(
+            self, ttl, _now=datetime.now, _timedelta=timedelta,
+            _utc=timezone.utc):
+        """Calculate the expires at time as an iso-formatted string for the
+        given ttl. This runs on every write, so the datetime machinery is
+        bound as argument defaults.
+
+        Args:
+            ttl (str, int, None): The string 'default', a time in seconds, or
+                None to return None
+
+        Returns:
+            An iso-formatted date time string for expiration if ttl is not None
+            (and either config ttl is not None or ttl is not default)
+        """
+        if checks.STRICT and ttl is not DEFAULT_TTL:
+            tus.check(ttl=(ttl, (str, int, type(None))))
+        if ttl is DEFAULT_TTL or ttl == 'default':
+            ttl = self._cfg.ttl_seconds
+        elif isinstance(ttl, str):
+            raise ValueError(f'ttl should be int, None, or \'default\', got \'{ttl}\'')
+
+        if ttl is None:
+            return None
+
+        return (_now(_utc) + _timedelta(seconds=ttl)).isoformat()
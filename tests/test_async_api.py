@@ -0,0 +1,118 @@
+import asyncio
+import unittest
+import helper
+from arango_crud import (  # noqa: E402
+    Config,
+    RandomCluster,
+    StepBackOffStrategy,
+    BasicAuth
+)
+
+
+def create_config(ttl=60):
+    return Config(
+        cluster=RandomCluster(urls=helper.TEST_CLUSTER_URLS),
+        timeout_seconds=10,
+        back_off=StepBackOffStrategy(steps=[1]),
+        ttl_seconds=ttl,
+        auth=BasicAuth(
+            username=helper.TEST_USERNAME,
+            password=helper.TEST_PASSWORD
+        ),
+        disable_database_delete=False,
+        disable_collection_delete=False
+    )
+
+
+class Test(unittest.TestCase):
+    def test_async_document(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        doc = coll.document('test_doc')
+        adoc = doc.as_async()
+        self.assertIs(adoc.document, doc)
+
+        async def flow():
+            self.assertFalse(await adoc.read())
+            self.assertEqual(doc.body, {})
+            doc.body['a'] = 1
+            self.assertTrue(await adoc.create())
+            self.assertTrue(await adoc.read())
+            self.assertEqual(doc.body, {'a': 1})
+            doc.body['b'] = 2
+            self.assertTrue(await adoc.compare_and_swap())
+            self.assertTrue(await adoc.read())
+            self.assertEqual(doc.body, {'a': 1, 'b': 2})
+            doc.body['b'] = 3
+            self.assertTrue(await adoc.overwrite())
+            self.assertTrue(await adoc.create_or_overwrite())
+            self.assertTrue(await adoc.read())
+            self.assertEqual(doc.body, {'a': 1, 'b': 3})
+            self.assertTrue(await adoc.compare_and_delete())
+            self.assertFalse(await adoc.read())
+            self.assertFalse(await adoc.force_delete())
+
+        asyncio.run(flow())
+        self.assertTrue(db.force_delete())
+
+    def test_async_collection(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        acoll = coll.as_async()
+        self.assertIs(acoll.collection, coll)
+
+        async def flow():
+            self.assertIsNone(await acoll.read_doc('doc_a'))
+            await acoll.create_or_overwrite_doc('doc_a', {'a': 1})
+            self.assertEqual(await acoll.read_doc('doc_a'), {'a': 1})
+            await acoll.create_or_overwrite_doc('doc_a', {'a': 2})
+            self.assertEqual(await acoll.read_doc('doc_a'), {'a': 2})
+            self.assertTrue(await acoll.touch_doc('doc_a'))
+            self.assertFalse(await acoll.touch_doc('doc_b'))
+            self.assertTrue(await acoll.force_delete_doc('doc_a'))
+            self.assertFalse(await acoll.force_delete_doc('doc_a'))
+            self.assertIsNone(await acoll.read_doc('doc_a'))
+
+        asyncio.run(flow())
+        self.assertTrue(db.force_delete())
+
+    def test_mixed_sync_async(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        doc = coll.document('test_doc')
+        doc.body['a'] = 1
+        self.assertTrue(doc.create())
+
+        adoc = doc.as_async()
+
+        async def flow():
+            doc.body['a'] = 2
+            self.assertTrue(await adoc.compare_and_swap())
+
+        asyncio.run(flow())
+
+        doc2 = coll.document('test_doc')
+        self.assertTrue(doc2.read())
+        self.assertEqual(doc2.body, {'a': 2})
+        self.assertTrue(doc.compare_and_delete())
+
+        self.assertTrue(db.force_delete())
+
+
+if __name__ == '__main__':
+    unittest.main()
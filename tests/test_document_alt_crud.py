@@ -227,6 +227,40 @@ class Test(unittest.TestCase):
 
         self.assertTrue(db.force_delete())
 
+    def test_patch(self):
+        cfg = create_config()
+
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        doc = coll.document('test_doc')
+        self.assertFalse(doc.patch({'a': 1}))
+        doc.body['a'] = 1
+        doc.body['b'] = 2
+        self.assertTrue(doc.create())
+
+        self.assertTrue(doc.patch({'b': 3}))
+        self.assertEqual(doc.body, {'a': 1, 'b': 3})
+        self.assertTrue(doc.read())
+        self.assertEqual(doc.body, {'a': 1, 'b': 3})
+
+        doc2 = coll.document('test_doc')
+        self.assertTrue(doc2.read())
+        doc2.body['a'] = 7
+        self.assertTrue(doc2.compare_and_swap())
+
+        self.assertFalse(doc.patch({'b': 4}))
+        self.assertTrue(doc.read())
+        self.assertEqual(doc.body, {'a': 7, 'b': 3})
+        self.assertTrue(doc.patch({'b': 4}))
+        self.assertTrue(doc.read())
+        self.assertEqual(doc.body, {'a': 7, 'b': 4})
+
+        self.assertTrue(db.force_delete())
+
     def test_force_delete(self):
         cfg = create_config()
 
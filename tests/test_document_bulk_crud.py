@@ -0,0 +1,177 @@
+import unittest
+import helper
+from arango_crud import (  # noqa: E402
+    Config,
+    RandomCluster,
+    StepBackOffStrategy,
+    BasicAuth
+)
+
+
+def create_config(ttl=60):
+    return Config(
+        cluster=RandomCluster(urls=helper.TEST_CLUSTER_URLS),
+        timeout_seconds=10,
+        back_off=StepBackOffStrategy(steps=[1]),
+        ttl_seconds=ttl,
+        auth=BasicAuth(
+            username=helper.TEST_USERNAME,
+            password=helper.TEST_PASSWORD
+        ),
+        disable_database_delete=False,
+        disable_collection_delete=False
+    )
+
+
+class Test(unittest.TestCase):
+    def test_create_read_delete(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        self.assertEqual(
+            coll.read_docs(['doc_a', 'doc_b']),
+            {'doc_a': None, 'doc_b': None}
+        )
+        coll.create_or_overwrite_docs({'doc_a': {'a': 1}, 'doc_b': {'b': 2}})
+        self.assertEqual(
+            coll.read_docs(['doc_a', 'doc_b', 'doc_c']),
+            {'doc_a': {'a': 1}, 'doc_b': {'b': 2}, 'doc_c': None}
+        )
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 1})
+
+        coll.create_or_overwrite_docs({'doc_a': {'a': 3}})
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 3})
+
+        coll.force_delete_docs(['doc_a', 'doc_b', 'doc_c'])
+        self.assertIsNone(coll.read_doc('doc_a'))
+        self.assertIsNone(coll.read_doc('doc_b'))
+
+        self.assertTrue(db.force_delete())
+
+    def test_no_ttl(self):
+        cfg = create_config(ttl=None)
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        coll.create_or_overwrite_docs({'doc_a': {'a': 1}}, ttl=None)
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 1})
+
+        self.assertTrue(db.force_delete())
+
+    def test_bulk_create_or_overwrite(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        doc_a = coll.document('doc_a')
+        doc_a.body['a'] = 1
+        doc_b = coll.document('doc_b')
+        doc_b.body['b'] = 2
+        coll.bulk_create_or_overwrite([doc_a, doc_b])
+        self.assertIsNotNone(doc_a.etag)
+        self.assertIsNotNone(doc_b.etag)
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 1})
+        self.assertEqual(coll.read_doc('doc_b'), {'b': 2})
+
+        doc_a.body['a'] = 3
+        self.assertTrue(doc_a.compare_and_swap())
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 3})
+
+        doc_a.body['a'] = 4
+        coll.bulk_create_or_overwrite([doc_a])
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 4})
+        self.assertTrue(doc_a.compare_and_delete())
+
+        self.assertTrue(db.force_delete())
+
+    def test_bulk_read(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        coll.create_or_overwrite_docs({'doc_a': {'a': 1}, 'doc_b': {'b': 2}})
+
+        doc_a = coll.document('doc_a')
+        doc_b = coll.document('doc_b')
+        doc_c = coll.document('doc_c')
+        self.assertEqual(
+            coll.bulk_read([doc_a, doc_b, doc_c]),
+            [True, True, False]
+        )
+        self.assertEqual(doc_a.body, {'a': 1})
+        self.assertEqual(doc_b.body, {'b': 2})
+        self.assertEqual(doc_c.body, {})
+        self.assertIsNone(doc_c.etag)
+
+        doc_a.body['a'] = 5
+        self.assertTrue(doc_a.compare_and_swap())
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 5})
+
+        self.assertTrue(db.force_delete())
+
+    def test_read_many(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        coll.create_or_overwrite_docs({'doc_a': {'a': 1}})
+
+        docs = coll.read_many(['doc_a', 'doc_b'])
+        self.assertEqual(len(docs), 2)
+        self.assertEqual(docs[0].key, 'doc_a')
+        self.assertEqual(docs[0].body, {'a': 1})
+        self.assertIsNotNone(docs[0].etag)
+        self.assertEqual(docs[1].key, 'doc_b')
+        self.assertEqual(docs[1].body, {})
+        self.assertIsNone(docs[1].etag)
+
+        self.assertTrue(db.force_delete())
+
+    def test_upsert_many(self):
+        cfg = create_config()
+        db = cfg.database(helper.TEST_ARANGO_DB)
+        self.assertTrue(db.create_if_not_exists())
+
+        coll = db.collection('test_coll')
+        self.assertTrue(coll.create_if_not_exists())
+
+        coll.upsert_many([])
+
+        doc_a = coll.document('doc_a')
+        doc_a.body['a'] = 1
+        doc_b = coll.document('doc_b')
+        doc_b.body['b'] = 2
+        coll.upsert_many([doc_a, doc_b])
+        self.assertIsNotNone(doc_a.etag)
+        self.assertIsNotNone(doc_b.etag)
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 1})
+        self.assertEqual(coll.read_doc('doc_b'), {'b': 2})
+
+        doc_a.body['a'] = 3
+        coll.upsert_many([doc_a])
+        self.assertEqual(coll.read_doc('doc_a'), {'a': 3})
+        self.assertEqual(coll.read_doc('doc_b'), {'b': 2})
+        self.assertTrue(doc_a.compare_and_delete())
+        self.assertIsNone(coll.read_doc('doc_a'))
+
+        self.assertTrue(db.force_delete())
+
+
+if __name__ == '__main__':
+    unittest.main()
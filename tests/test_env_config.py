@@ -90,7 +90,7 @@ class Test(unittest.TestCase):
             }
         )
         self.assertIsInstance(cfg.back_off, StepBackOffStrategy)
-        self.assertEqual(cfg.back_off.steps, [1.0, 2.5, 0.1])
+        self.assertEqual(cfg.back_off.steps, (1.0, 2.5, 0.1))
 
     def test_ttl(self):
         cfg = env_config(
@@ -179,7 +179,7 @@ class Test(unittest.TestCase):
             }
         )
         self.assertFalse(cfg.disable_database_delete)
-        self.assertEqual(cfg.protected_databases, ['test_db', 'test_db2'])
+        self.assertEqual(cfg.protected_databases, frozenset(['test_db', 'test_db2']))
 
     def test_disable_coll_delete(self):
         cfg = env_config(
@@ -205,7 +205,9 @@ class Test(unittest.TestCase):
             }
         )
         self.assertFalse(cfg.disable_collection_delete)
-        self.assertEqual(cfg.protected_collections, ['test_coll', 'test_coll2'])
+        self.assertEqual(
+            cfg.protected_collections, frozenset(['test_coll', 'test_coll2'])
+        )
 
 
 if __name__ == '__main__':